@@ -1,16 +1,72 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+from .dbstats import estimated_row_count
+
+# Tables smaller than this are always counted exactly
+ESTIMATED_COUNT_THRESHOLD = 100_000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that takes the row count of an unfiltered changelist from the
+    database's table statistics instead of running COUNT(*) over the table.
+    Filtered or searched changelists, and small tables, are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Skip the second, unfiltered COUNT(*) behind the "N total" link
+    show_full_result_count = False
+
 
 # Register your models here.
 # User Profile
 from .models import UserProfile
-admin.site.register(UserProfile)
+
+@admin.register(UserProfile)
+class UserProfileAdmin(ScalableModelAdmin):
+    list_display = ('user_email', 'dietary_preference', 'budget')
+    list_select_related = ('user',)  # __str__ and user_email read user.email
+    list_filter = ('dietary_preference',)
+    search_fields = ('^user__email',)  # Prefix search can use the unique email index
+    raw_id_fields = ('user',)
+
+    @admin.display(description='Email', ordering='user__email')
+    def user_email(self, obj):
+        return obj.user.email
 
 # Saved Recipes
 from .models import Recipe
-admin.site.register(Recipe)
+
+@admin.register(Recipe)
+class RecipeAdmin(ScalableModelAdmin):
+    list_display = ('title', 'user_email', 'cost', 'saved_at')
+    list_select_related = ('user',)
+    list_filter = ('saved_at',)
+    search_fields = ('^title', '^user__email')
+    raw_id_fields = ('user',)
+    ordering = ('-id',)
+
+    @admin.display(description='Owner', ordering='user__email')
+    def user_email(self, obj):
+        return obj.user.email
 
 # User
 from .models import CustomUser
 @admin.register(CustomUser)
-class CustomUserAdmin(admin.ModelAdmin):
-    list_display = ('email', 'is_staff', 'is_active')  # Customize as needed
\ No newline at end of file
+class CustomUserAdmin(ScalableModelAdmin):
+    list_display = ('email', 'is_staff', 'is_active')  # Customize as needed
+    list_filter = ('is_staff', 'is_active')
+    search_fields = ('^email', '^full_name')
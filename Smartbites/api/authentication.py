@@ -0,0 +1,124 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from .dbstats import estimated_row_count, row_count
+from .models import AuthFailureCounter, TokenExpiry
+
+PURGE_STATS_KEY = 'auth-purge-stats'
+
+
+def last_refreshed(token):
+    """
+    When the token was issued or last refreshed. Token.created always keeps the
+    issue time; tokens issued before expiry tracking have no row and use it.
+    """
+    try:
+        return token.expiry.refreshed_at
+    except TokenExpiry.DoesNotExist:
+        return token.created
+
+
+def is_expired(token, now=None):
+    return last_refreshed(token) < (now or timezone.now()) - settings.TOKEN_TTL
+
+
+class ExpiringTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication where a token expires TOKEN_TTL after it was last
+    refreshed. Using a token slides its expiry forward, but its TokenExpiry row
+    is only rewritten once per TOKEN_REFRESH_INTERVAL so reads stay read-only.
+    """
+
+    def authenticate_credentials(self, key):
+        try:
+            token = Token.objects.select_related('user', 'expiry').get(key=key)
+        except Token.DoesNotExist:
+            raise AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        now = timezone.now()
+        if is_expired(token, now):
+            Token.objects.filter(pk=token.pk).delete()
+            raise AuthenticationFailed('Token has expired.')
+        if last_refreshed(token) < now - settings.TOKEN_REFRESH_INTERVAL:
+            if not TokenExpiry.objects.filter(token=token).update(refreshed_at=now):
+                TokenExpiry.objects.create(token=token, refreshed_at=now)
+            token.expiry = TokenExpiry(token=token, refreshed_at=now)
+        return token.user, token
+
+
+# Purging expired tokens and sessions
+def _purge(queryset, pk_name, batch_size, pause):
+    """
+    Delete matching rows in small primary-key batches; returns the number
+    deleted, not counting rows removed with them by cascades.
+    """
+    deleted = 0
+    while True:
+        batch = list(queryset.order_by().values_list(pk_name, flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += queryset.filter(**{f'{pk_name}__in': batch}).delete()[1].get(queryset.model._meta.label, 0)
+        if pause:
+            time.sleep(pause)
+
+
+def purge_expired(batch_size=1000, pause=0.0):
+    """
+    Delete expired tokens, sessions and failed-login counters in batches
+    driven by their expiry indexes, so no statement holds locks for long. Records stats
+    for the metrics endpoint in the 'shared' cache, which the web workers can
+    read although this usually runs as a management command, and returns them.
+    """
+    started = time.perf_counter()
+    now = timezone.now()
+    tokens = _purge(Token.objects.filter(expiry__refreshed_at__lt=now - settings.TOKEN_TTL), 'key', batch_size, pause)
+    sessions = _purge(Session.objects.filter(expire_date__lt=now), 'session_key', batch_size, pause)
+    counters = _purge(AuthFailureCounter.objects.filter(expires_at__lt=now), 'id', batch_size, pause)
+    seconds = time.perf_counter() - started
+    stats = {
+        'tokens_deleted': tokens,
+        'sessions_deleted': sessions,
+        'failure_counters_deleted': counters,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round((tokens + sessions) / seconds, 1) if seconds else 0,
+        'token_rows': row_count(Token),
+        'session_rows': row_count(Session),
+        'finished_at': int(time.time()),
+    }
+    caches['shared'].set(PURGE_STATS_KEY, stats, None)
+    return stats
+
+
+def render_auth_metrics():
+    """
+    Auth table sizes, estimated when scraped (omitted on backends without
+    table statistics), and the last purge run, in the Prometheus text format.
+    """
+    gauges = []
+    for name, model in (('smartbites_auth_token_rows', Token), ('smartbites_auth_session_rows', Session)):
+        rows = estimated_row_count(model)
+        if rows is not None:
+            gauges.append((name, f'Estimated rows in {model._meta.db_table}.', rows))
+    stats = caches['shared'].get(PURGE_STATS_KEY)
+    if stats:
+        gauges += [
+            ('smartbites_auth_purge_deleted_rows', 'Rows deleted by the last purge.', stats['tokens_deleted'] + stats['sessions_deleted']),
+            ('smartbites_auth_purge_duration_seconds', 'Duration of the last purge.', stats['seconds']),
+            ('smartbites_auth_purge_rows_per_second', 'Delete throughput of the last purge.', stats['rows_per_second']),
+            ('smartbites_auth_purge_last_run_timestamp_seconds', 'When the last purge finished.', stats['finished_at']),
+        ]
+    if not gauges:
+        return ''
+    lines = []
+    for name, help_text, value in gauges:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {value}']
+    return '\n'.join(lines) + '\n'
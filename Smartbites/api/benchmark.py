@@ -0,0 +1,233 @@
+"""
+Offline benchmark tooling: a stub Ollama server, a threaded HTTP load driver
+and report comparison. Used by the stub_ollama, seed_synthetic_data and
+run_benchmark management commands.
+"""
+import json
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+STUB_RECIPE = {
+    "title": "Chicken Adobo",
+    "ingredients": ["chicken", "soy sauce", "vinegar", "garlic", "bay leaves"],
+    "instructions": ["Marinate the chicken.", "Simmer until tender.", "Serve with rice."],
+    "cost": 180,
+}
+STUB_TEXT = (
+    "Here is an easy recipe you can cook tonight. Chicken adobo: marinate chicken in soy sauce, "
+    "vinegar and garlic, then simmer with bay leaves until tender and serve with rice."
+)
+
+
+# Stub Ollama
+class StubOllamaServer(ThreadingHTTPServer):
+    """
+    Answers POST /api/generate like Ollama: waits `latency` seconds, then
+    streams NDJSON tokens at `token_rate` tokens per second. Requests with
+    "format": "json" get a JSON recipe, others plain text.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.2, token_rate=50.0):
+        super().__init__(address, _StubOllamaHandler)
+        self.latency = latency
+        self.token_rate = token_rate
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api/generate"
+
+    def start(self):
+        """Serve from a daemon thread; call shutdown() to stop."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class _StubOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/api/generate":
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self.send_error(400)
+            return
+
+        text = json.dumps(STUB_RECIPE) if payload.get("format") == "json" else STUB_TEXT
+        tokens = re.findall(r"\S+\s*", text)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        time.sleep(self.server.latency)
+        delay = 1.0 / self.server.token_rate if self.server.token_rate > 0 else 0
+        try:
+            for token in tokens:
+                self._write_chunk({"model": payload.get("model"), "response": token, "done": False})
+                if delay:
+                    time.sleep(delay)
+            self._write_chunk({"model": payload.get("model"), "response": "", "done": True})
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading early (e.g. a complete JSON recipe was parsed)
+            self.close_connection = True
+
+    def _write_chunk(self, data):
+        body = json.dumps(data).encode() + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(body), body))
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Statistics
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers (0 < fraction <= 1)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * fraction // 1))
+    return ordered[int(rank) - 1]
+
+
+def summarize(samples, elapsed):
+    """Throughput, latency percentiles (ms) and queries per request for one endpoint."""
+    latencies = [sample["latency"] * 1000 for sample in samples]
+    queries = [sample["queries"] for sample in samples if sample["queries"] is not None]
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for sample in samples if not sample["ok"]),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 0.50), 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99), 2) if latencies else None,
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+_QUERIES = re.compile(r'(?:^|,\s*)db;[^,]*desc="(\d+) queries"')
+
+
+def queries_from_server_timing(header):
+    match = _QUERIES.search(header or "")
+    return int(match.group(1)) if match else None
+
+
+def compare(report, baseline, tolerance=0.2):
+    """
+    List regressions of `report` against `baseline`: slower p95, lower
+    throughput (beyond `tolerance`) or more queries per request.
+    """
+    regressions = []
+    for level, endpoints in report["results"].items():
+        for endpoint, current in endpoints.items():
+            previous = baseline.get("results", {}).get(level, {}).get(endpoint)
+            if not previous:
+                continue
+            where = f"{endpoint} @ concurrency {level}"
+            if previous.get("p95_ms") and current["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{where}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+            if (previous.get("throughput_rps") and current["throughput_rps"]
+                    and current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance)):
+                regressions.append(f"{where}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} rps")
+            if (previous.get("queries_per_request") is not None and current["queries_per_request"] is not None
+                    and current["queries_per_request"] > previous["queries_per_request"]):
+                regressions.append(
+                    f"{where}: queries/request {previous['queries_per_request']} -> {current['queries_per_request']}")
+    return regressions
+
+
+# Load driver
+class LoadDriver:
+    """Runs scenarios against a live server with a fixed number of concurrent clients."""
+
+    SCENARIOS = ["auth", "recipe_crud", "listing", "query_ollama"]
+
+    def __init__(self, base_url, password="benchmark-pass", timeout=120):
+        self.base_url = base_url.rstrip("/")
+        self.password = password
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def request(self, session, name, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+            ok, queries = response.ok, queries_from_server_timing(response.headers.get("Server-Timing"))
+        except requests.RequestException:
+            response, ok, queries = None, False, None
+        sample = {"latency": time.perf_counter() - started, "ok": ok, "queries": queries}
+        with self._lock:
+            self._samples.setdefault(name, []).append(sample)
+        return response
+
+    def login(self, session, email):
+        response = self.request(session, "login", "POST", "/api/login/", json={"email": email, "password": self.password})
+        if response is not None and response.ok:
+            session.headers["Authorization"] = "Token " + response.json()["token"]
+            return True
+        return False
+
+    # Scenarios: one iteration each, run by a worker with its own session
+    def auth(self, session, email):
+        new_email = f"bench-{uuid.uuid4().hex}@example.com"
+        self.request(session, "register", "POST", "/api/register/",
+                     json={"email": new_email, "password": self.password, "full_name": "Bench User"})
+        self.login(session, new_email)
+
+    def recipe_crud(self, session, email):
+        title = f"Bench recipe {uuid.uuid4().hex}"
+        response = self.request(session, "save_recipe", "POST", "/api/save-recipe/", json={
+            "title": title, "ingredients": "rice, egg", "instructions": "Fry the rice.", "cost": "45.00",
+        })
+        if response is None or not response.ok:
+            return
+        recipe_id = response.json()["recipe"]["id"]
+        self.request(session, "update_recipe", "PUT", f"/api/update-recipe/{recipe_id}/", json={"cost": "50.00"})
+        self.request(session, "delete_recipe", "DELETE", f"/api/delete-recipe/{recipe_id}/")
+
+    def listing(self, session, email):
+        self.request(session, "get_user_recipes", "GET", "/api/get-user-recipes/")
+
+    def query_ollama(self, session, email):
+        self.request(session, "query_ollama", "POST", "/api/query-ollama/", json={"prompt": "What should I cook?"})
+
+    def run(self, scenarios, concurrency, iterations, emails):
+        """
+        Run `iterations` of each scenario per client with `concurrency` clients,
+        each logged in as one of `emails`. Returns {endpoint: summary}.
+        """
+        sessions = []
+        for index in range(concurrency):
+            session = requests.Session()
+            if not self.login(session, emails[index % len(emails)]):
+                raise RuntimeError(f"Could not log in as {emails[index % len(emails)]}; seed the users first.")
+            sessions.append((session, emails[index % len(emails)]))
+        self._samples = {}
+
+        def client(session, email):
+            for _ in range(iterations):
+                for scenario in scenarios:
+                    getattr(self, scenario)(session, email)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(client, session, email) for session, email in sessions]:
+                future.result()
+        elapsed = time.perf_counter() - started
+        return {name: summarize(samples, elapsed) for name, samples in sorted(self._samples.items())}
@@ -0,0 +1,217 @@
+import hashlib
+import json
+from itertools import islice
+
+from django.db import connections, router, transaction
+from rest_framework.exceptions import ValidationError
+
+from .models import Recipe
+from .serializers import RecipeSerializer, recipe_list_encoder
+
+# Rows read per page (keyset pagination on id) when scanning a user's recipes
+EXPORT_CHUNK_SIZE = 2000
+# Recipes written per bulk_create / transaction
+IMPORT_BATCH_SIZE = 1000
+# Stop collecting per-line errors after this many (they are still counted)
+MAX_REPORTED_ERRORS = 1000
+# Largest bulk update accepted in one request, so it always runs as one UPDATE
+BULK_UPDATE_MAX = 500
+
+
+def _content_key(title, ingredients, instructions):
+    """Compact digest of the fields save_recipe uses to detect duplicates."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (title, ingredients, instructions):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.digest()
+
+
+def _rows_by_id(queryset, fields, chunk_size=None):
+    """
+    Yield values_list() tuples of `fields` page by page in primary key order.
+
+    Keyset pagination keeps memory constant on every backend; iterator()
+    does not, since the MySQL backend fetches the whole result set.
+    """
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    last_id = None
+    while True:
+        page = queryset.order_by('id')
+        if last_id is not None:
+            page = page.filter(id__gt=last_id)
+        rows = list(page.values_list('id', *fields)[:chunk_size])
+        for row in rows:
+            yield row[1:]
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1][0]
+
+
+# Export
+def export_recipes(user):
+    """Return a generator of the user's recipes as NDJSON lines, in constant memory."""
+    rows = _rows_by_id(Recipe.objects.filter(user=user), recipe_list_encoder.fields)
+    return recipe_list_encoder.render_lines(rows)
+
+
+def export_chunks(user, lines_per_chunk=EXPORT_CHUNK_SIZE):
+    """
+    export_recipes() joined into chunks of many lines, for streamed responses:
+    each chunk is written (and compressed and flushed) on its own.
+    """
+    lines = export_recipes(user)
+    while chunk := list(islice(lines, lines_per_chunk)):
+        yield b''.join(chunk)
+
+
+# Import
+def import_recipes(user, lines, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Parse NDJSON recipes line by line and save them in bulk_create batches.
+
+    Lines that duplicate an existing recipe (or an earlier line) are skipped,
+    invalid lines are reported by line number. Returns a report dict.
+    """
+    seen = {
+        _content_key(*row)
+        for row in _rows_by_id(Recipe.objects.filter(user=user), ('title', 'ingredients', 'instructions'))
+    }
+    report = {'created': 0, 'duplicates': 0, 'error_count': 0, 'errors': []}
+    batch = []
+    # One serializer validates every line, so its fields are only built once
+    serializer = RecipeSerializer()
+
+    def add_error(number, errors):
+        report['error_count'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'line': number, 'errors': errors})
+
+    def flush():
+        with transaction.atomic():
+            Recipe.objects.bulk_create(batch)
+        report['created'] += len(batch)
+        batch.clear()
+
+    for number, line in enumerate(lines, start=1):
+        try:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            if not line.strip():
+                continue
+            data = json.loads(line)
+        except ValueError as e:
+            add_error(number, {'non_field_errors': [f'Invalid JSON: {e}']})
+            continue
+        if not isinstance(data, dict):
+            add_error(number, {'non_field_errors': ['Expected a JSON object.']})
+            continue
+
+        try:
+            fields = serializer.run_validation(data)
+        except ValidationError as e:
+            add_error(number, e.detail)
+            continue
+
+        key = _content_key(fields['title'], fields['ingredients'], fields['instructions'])
+        if key in seen:
+            report['duplicates'] += 1
+            continue
+        seen.add(key)
+
+        batch.append(Recipe(user=user, **fields))
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+    return report
+
+
+# Generated recipes
+def save_recipes(user, recipes):
+    """
+    Save validated recipe fields in one transaction, skipping any the user
+    already has. Returns the number of recipes created.
+    """
+    existing = {
+        _content_key(*row)
+        for row in Recipe.objects.filter(user=user, title__in={fields['title'] for fields in recipes})
+        .values_list('title', 'ingredients', 'instructions')
+    }
+    new_recipes = []
+    for fields in recipes:
+        key = _content_key(fields['title'], fields['ingredients'], fields['instructions'])
+        if key not in existing:
+            existing.add(key)
+            new_recipes.append(Recipe(user=user, **fields))
+    with transaction.atomic():
+        Recipe.objects.bulk_create(new_recipes)
+    return len(new_recipes)
+
+
+# Bulk update
+def update_recipes(user, updates):
+    """
+    Apply validated partial updates ({recipe_id: fields}) to the user's recipes.
+
+    Runs one SELECT and one UPDATE regardless of how many recipes change.
+    Returns the updated recipes and the ids that were not found.
+    """
+    owned = Recipe.objects.filter(user=user)
+    recipes = owned.in_bulk(list(updates))
+    changed_fields = set()
+    for recipe_id, fields in updates.items():
+        recipe = recipes.get(recipe_id)
+        if recipe is None:
+            continue
+        for name, value in fields.items():
+            setattr(recipe, name, value)
+        changed_fields.update(fields)
+
+    if recipes and changed_fields:
+        owned.bulk_update(recipes.values(), sorted(changed_fields), batch_size=BULK_UPDATE_MAX)
+    missing_ids = [recipe_id for recipe_id in updates if recipe_id not in recipes]
+    return list(recipes.values()), missing_ids
+
+
+# Bulk delete
+def _supports_delete_returning(connection):
+    if connection.vendor == 'mysql':
+        return connection.mysql_is_mariadb
+    return connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert
+
+
+def delete_recipes(user, recipe_ids):
+    """
+    Delete the user's recipes among recipe_ids and return the removed ids.
+
+    Uses a single DELETE ... RETURNING where the backend supports it,
+    otherwise locks the matching rows and deletes them in one transaction.
+    """
+    recipe_ids = sorted({int(recipe_id) for recipe_id in recipe_ids})
+    if not recipe_ids:
+        return []
+
+    alias = router.db_for_write(Recipe)
+    connection = connections[alias]
+    if _supports_delete_returning(connection):
+        quote = connection.ops.quote_name
+        opts = Recipe._meta
+        pk_column = quote(opts.pk.column)
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        sql = (
+            f"DELETE FROM {quote(opts.db_table)} "
+            f"WHERE {quote(opts.get_field('user').column)} = %s AND {pk_column} IN ({placeholders}) "
+            f"RETURNING {pk_column}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user.pk, *recipe_ids])
+            return sorted(row[0] for row in cursor.fetchall())
+
+    with transaction.atomic(using=alias):
+        recipes = Recipe.objects.using(alias).filter(user=user, id__in=recipe_ids)
+        deleted_ids = list(recipes.select_for_update().values_list('id', flat=True))
+        if deleted_ids:
+            recipes.delete()
+    return deleted_ids
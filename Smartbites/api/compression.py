@@ -0,0 +1,118 @@
+import re
+import zlib
+
+try:
+    import brotli
+except ImportError:  # Optional: without it clients are offered gzip only
+    brotli = None
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+# Only the API's own JSON, NDJSON and compact bodies. HTML (admin, browsable API)
+# can echo secrets such as CSRF tokens next to user input, which compression
+# would expose to BREACH-style attacks.
+COMPRESSIBLE_TYPES = re.compile(
+    r'^\s*application/(json|x-ndjson|vnd\.smartbites\.compact\+json)\s*(;|$)', re.IGNORECASE)
+
+_CODING = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?', re.IGNORECASE)
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick "br" or "gzip" from an Accept-Encoding header, or None to send the body as is."""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        match = _CODING.match(part)
+        if not match:
+            continue
+        try:
+            quality = float(match.group(2)) if match.group(2) else 1.0
+        except ValueError:
+            quality = 0.0
+        accepted[match.group(1).lower()] = quality
+
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_quality = None, 0.0
+    for coding in offered:  # Earlier codings win ties
+        quality = accepted.get(coding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class Compressor:
+    """Incremental gzip or brotli compressor."""
+
+    def __init__(self, encoding):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+            self.compress = compressor.process
+            self.flush = compressor.flush
+            self.finish = compressor.finish
+        else:
+            compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self.compress = compressor.compress
+            self.flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+            self.finish = compressor.flush
+
+
+def compress(data, encoding):
+    compressor = Compressor(encoding)
+    return compressor.compress(data) + compressor.finish()
+
+
+def compress_stream(chunks, encoding):
+    """
+    Compress a streamed body, flushing after every chunk so the client can
+    decode each one as soon as it arrives (e.g. tokens of a BiteAI reply).
+    Producers that stream many small lines should batch them into chunks.
+    """
+    compressor = Compressor(encoding)
+    for chunk in chunks:
+        if chunk:
+            yield compressor.compress(chunk) + compressor.flush()
+    yield compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    Compresses API JSON and NDJSON responses with the best coding the client accepts
+    (brotli when installed, otherwise gzip). Bodies smaller than
+    settings.COMPRESSION_MIN_SIZE are sent as is; streamed bodies are always
+    compressed and flushed chunk by chunk.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.has_header('Content-Encoding') or not COMPRESSIBLE_TYPES.match(response.get('Content-Type', '')):
+            return response
+        if response.streaming:
+            if response.is_async:
+                return response
+        elif len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(response.streaming_content, encoding)
+            del response.headers['Content-Length']
+        else:
+            compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The compressed body is a different representation of the same resource
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
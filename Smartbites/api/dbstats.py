@@ -0,0 +1,31 @@
+from django.db import connections, router
+
+
+def estimated_row_count(model):
+    """
+    Row count of the model's table from the database's statistics (cheap, but
+    approximate), or None when the backend keeps none we can read.
+    """
+    alias = router.db_for_read(model)
+    connection = connections[alias]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                [table],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def row_count(model):
+    """Estimated row count where available, otherwise an exact COUNT(*)."""
+    estimate = estimated_row_count(model)
+    return estimate if estimate is not None else model._default_manager.count()
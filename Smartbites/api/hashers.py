@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the iteration count taken from settings.PASSWORD_PBKDF2_ITERATIONS.
+
+    Hashes made with a different count still verify and are re-hashed with the
+    configured one on the user's next login, so the cost can be tuned either way
+    without locking anyone out.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', None) or PBKDF2PasswordHasher.iterations
@@ -0,0 +1,206 @@
+import contextvars
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+from django.conf import settings
+from django.db import connections
+
+# Metrics of the request being handled; None outside of a request
+_current = ContextVar('request_metrics', default=None)
+
+# Methods reported as their own label value; anything else a client sends is "other",
+# so arbitrary method tokens cannot grow the label sets without bound
+METHODS = frozenset({'GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD', 'OPTIONS'})
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+
+
+# Histograms
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus text format, one series per label set."""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}
+        self._lock = Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        for key, counts, total in sorted(series):
+            labels = ','.join(f'{name}="{value}"' for name, value in key)
+            prefix = labels + ',' if labels else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            suffix = '{' + labels + '}' if labels else ''
+            lines.append(f'{self.name}_sum{suffix} {total}')
+            lines.append(f'{self.name}_count{suffix} {cumulative}')
+        return lines
+
+
+request_duration = Histogram(
+    'smartbites_request_duration_seconds', 'Time spent handling a request, by view.', SECONDS_BUCKETS)
+db_queries = Histogram(
+    'smartbites_db_queries', 'Database queries made per request, by view.', QUERY_BUCKETS)
+db_duration = Histogram(
+    'smartbites_db_duration_seconds', 'Time spent in database queries per request, by view.', SECONDS_BUCKETS)
+phase_duration = Histogram(
+    'smartbites_phase_duration_seconds', 'Time spent in named phases of a request, by view and phase.', SECONDS_BUCKETS)
+
+HISTOGRAMS = [request_duration, db_queries, db_duration, phase_duration]
+
+
+def render_metrics():
+    """All metrics of this process in the Prometheus text exposition format."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return '\n'.join(lines) + '\n'
+
+
+# Per-request recording
+class RequestMetrics:
+    def __init__(self):
+        self.view = 'unmatched'
+        self.queries = 0
+        self.db_time = 0.0
+        self.phases = {}
+        self._lock = Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook: count and time every query
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+    def add_phase(self, name, seconds):
+        # Phases may be recorded from worker threads running in a copy of the request context
+        with self._lock:
+            total, count = self.phases.get(name, (0.0, 0))
+            self.phases[name] = (total + seconds, count + 1)
+
+
+def record_phase(name, seconds):
+    """Record a named phase of the current request (no-op outside a request)."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_phase(name, seconds)
+
+
+@contextmanager
+def phase(name):
+    """Time the enclosed block as a named phase of the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - start)
+
+
+def _server_timing(metrics, total):
+    entries = [
+        f'total;dur={total * 1000:.1f}',
+        f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"',
+    ]
+    for name, (seconds, count) in metrics.phases.items():
+        entry = f'{name};dur={seconds * 1000:.1f}'
+        if count > 1:
+            entry += f';desc="x{count}"'
+        entries.append(entry)
+    return ', '.join(entries)
+
+
+@contextmanager
+def _counting_queries(metrics):
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics))
+        yield
+
+
+def _observe(metrics, total, method):
+    view = metrics.view
+    request_duration.observe(total, view=view, method=method if method in METHODS else 'other')
+    db_queries.observe(metrics.queries, view=view)
+    db_duration.observe(metrics.db_time, view=view)
+    for name, (seconds, _) in metrics.phases.items():
+        phase_duration.observe(seconds, view=view, phase=name)
+
+
+class PerformanceMiddleware:
+    """
+    Counts and times database queries per request, collects named phases
+    recorded with `phase()`, and reports them in a Server-Timing header and
+    in the latency histograms served by the metrics endpoint.
+
+    Streamed bodies are produced after the view returns: they are generated in
+    the request's context, so their queries and phases still count, and the
+    request is observed when the stream closes. Their Server-Timing header,
+    sent before the body, only covers the work done up to the first byte.
+
+    Histograms are kept per process; scrape every worker or aggregate downstream.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            with _counting_queries(metrics):
+                response = self.get_response(request)
+            context = contextvars.copy_context() if response.streaming and not response.is_async else None
+        finally:
+            _current.reset(token)
+
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = _server_timing(metrics, time.perf_counter() - start)
+        if context is not None:
+            response.streaming_content = self._stream(response.streaming_content, metrics, context, start, request.method)
+        else:
+            _observe(metrics, time.perf_counter() - start, request.method)
+        return response
+
+    def _stream(self, content, metrics, context, start, method):
+        chunks = iter(content)
+        try:
+            while True:
+                with _counting_queries(metrics):
+                    try:
+                        chunk = context.run(next, chunks)
+                    except StopIteration:
+                        return
+                yield chunk
+        finally:
+            _observe(metrics, time.perf_counter() - start, method)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+        match = request.resolver_match
+        if metrics is not None and match is not None:
+            metrics.view = match.url_name or match.view_name
+        return None
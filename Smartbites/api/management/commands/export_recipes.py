@@ -0,0 +1,34 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bulk import export_recipes
+from api.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = "Export a user's recipes as NDJSON (one recipe per line)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help="Email of the user whose recipes are exported.")
+        parser.add_argument('--output', '-o', default='-', help="File to write to, or '-' for stdout.")
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(email=options['email'])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"User {options['email']} does not exist.")
+
+        if options['output'] == '-':
+            out, close = sys.stdout.buffer, False
+        else:
+            out, close = open(options['output'], 'wb'), True
+        try:
+            count = 0
+            for line in export_recipes(user):
+                out.write(line)
+                count += 1
+        finally:
+            if close:
+                out.close()
+        self.stderr.write(f"Exported {count} recipes.")
@@ -0,0 +1,32 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bulk import IMPORT_BATCH_SIZE, import_recipes
+from api.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = "Import NDJSON recipes (one recipe per line) into a user's collection."
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help="Email of the user who will own the recipes.")
+        parser.add_argument('input', nargs='?', default='-', help="NDJSON file to read, or '-' for stdin.")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+                            help="Recipes written per bulk insert and transaction.")
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(email=options['email'])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"User {options['email']} does not exist.")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        if options['input'] == '-':
+            report = import_recipes(user, sys.stdin.buffer, batch_size=options['batch_size'])
+        else:
+            with open(options['input'], 'rb') as lines:
+                report = import_recipes(user, lines, batch_size=options['batch_size'])
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,23 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.authentication import purge_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired auth tokens and sessions in small batches. "
+        "Run it periodically, e.g. from cron every 15 minutes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows deleted per statement.")
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help="Seconds to sleep between batches, to leave room for other writers.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        stats = purge_expired(batch_size=options['batch_size'], pause=options['pause'])
+        self.stdout.write(json.dumps(stats))
@@ -0,0 +1,69 @@
+import json
+import platform
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import LoadDriver, compare
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive a running API server with concurrent clients and report throughput, "
+        "p50/p95/p99 latency and queries per request as JSON. Seed users with "
+        "seed_synthetic_data and run the server against stub_ollama to work offline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--scenarios', default=','.join(LoadDriver.SCENARIOS),
+                            help=f"Comma-separated, from: {', '.join(LoadDriver.SCENARIOS)}.")
+        parser.add_argument('--concurrency', default='1,8,32', help="Comma-separated client counts to run.")
+        parser.add_argument('--iterations', type=int, default=20, help="Iterations of each scenario per client.")
+        parser.add_argument('--prefix', default='bench', help="Seeded user prefix (see seed_synthetic_data).")
+        parser.add_argument('--users', type=int, default=100, help="How many seeded users to log in as.")
+        parser.add_argument('--password', default='benchmark-pass')
+        parser.add_argument('--output', help="Write the JSON report to this file.")
+        parser.add_argument('--baseline', help="Compare against a stored report and fail on regressions.")
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help="Allowed relative p95/throughput change before it counts as a regression.")
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = set(scenarios) - set(LoadDriver.SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError("--concurrency must be a comma-separated list of numbers.")
+
+        driver = LoadDriver(options['base_url'], password=options['password'])
+        emails = [f"{options['prefix']}-{n}@example.com" for n in range(options['users'])]
+        report = {
+            "base_url": options['base_url'],
+            "scenarios": scenarios,
+            "iterations": options['iterations'],
+            "python": platform.python_version(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "results": {},
+        }
+        for level in levels:
+            self.stderr.write(f"Running {', '.join(scenarios)} with {level} clients...")
+            try:
+                report["results"][str(level)] = driver.run(scenarios, level, options['iterations'], emails)
+            except RuntimeError as e:
+                raise CommandError(str(e))
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                regressions = compare(report, json.load(f), options['tolerance'])
+            if regressions:
+                raise CommandError("Regressions against baseline:\n  " + "\n  ".join(regressions))
+            self.stderr.write("No regressions against baseline.")
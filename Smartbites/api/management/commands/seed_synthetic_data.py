@@ -0,0 +1,83 @@
+import itertools
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import CustomUser, Recipe, UserProfile
+
+DISHES = ["Adobo", "Sinigang", "Tinola", "Kare-kare", "Pancit", "Lumpia", "Bicol Express", "Tapsilog", "Ginataang Gulay"]
+INGREDIENTS = ["chicken", "pork", "beef", "tofu", "rice", "garlic", "onion", "tomato", "soy sauce", "vinegar",
+               "coconut milk", "eggplant", "string beans", "ginger", "shrimp paste", "noodles", "egg", "kangkong"]
+DIETS = ["omnivore", "vegan", "keto", "vegetarian"]
+
+
+class Command(BaseCommand):
+    help = "Create synthetic users, profiles and recipes for benchmarks (all users share one password)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=10000, help="Total recipes, spread over the users.")
+        parser.add_argument('--prefix', default='bench', help="Emails are <prefix>-<n>@example.com.")
+        parser.add_argument('--password', default='benchmark-pass')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0, help="Random seed, for repeatable data.")
+        parser.add_argument('--reset', action='store_true', help="Delete users with this prefix first.")
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['batch_size'] < 1:
+            raise CommandError("--users and --batch-size must be at least 1.")
+        rng = random.Random(options['seed'])
+        prefix = options['prefix']
+        batch_size = options['batch_size']
+        users = CustomUser.objects.filter(email__startswith=f"{prefix}-", email__endswith="@example.com")
+
+        if options['reset']:
+            users.delete()
+        elif users.exists():
+            raise CommandError(f"Users with prefix '{prefix}' already exist; use --reset or another --prefix.")
+
+        # Hash once: PBKDF2 per user would dominate the run
+        password = make_password(options['password'])
+        emails = [f"{prefix}-{n}@example.com" for n in range(options['users'])]
+        with transaction.atomic():
+            for chunk in _chunks(emails, batch_size):
+                CustomUser.objects.bulk_create(
+                    [CustomUser(email=email, full_name=f"Bench {email}", password=password) for email in chunk])
+        # bulk_create skips the post_save signal that creates profiles
+        user_ids = list(users.order_by('id').values_list('id', flat=True))
+        with transaction.atomic():
+            for chunk in _chunks(user_ids, batch_size):
+                UserProfile.objects.bulk_create([
+                    UserProfile(user_id=user_id, dietary_preference=rng.choice(DIETS),
+                                budget=Decimal(rng.randrange(2000, 20000)))
+                    for user_id in chunk
+                ])
+
+        # Generated lazily so millions of recipes never sit in memory at once
+        recipes = (
+            Recipe(
+                user_id=user_ids[n % len(user_ids)],
+                title=f"{rng.choice(DISHES)} #{n}",
+                ingredients=", ".join(rng.sample(INGREDIENTS, rng.randint(3, 8))),
+                instructions=" ".join(f"Step {step}: cook until done." for step in range(1, rng.randint(3, 12))),
+                cost=Decimal(rng.randrange(3000, 50000)) / 100,
+            )
+            for n in range(options['recipes'])
+        )
+        created = 0
+        for chunk in _chunks(recipes, batch_size):
+            with transaction.atomic():
+                Recipe.objects.bulk_create(chunk)
+            created += len(chunk)
+            self.stderr.write(f"\r{created} recipes", ending='')
+        self.stderr.write("")
+        self.stdout.write(f"Created {len(user_ids)} users and {created} recipes (password: {options['password']}).")
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
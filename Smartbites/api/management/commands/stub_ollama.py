@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from api.benchmark import StubOllamaServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a stub Ollama server for offline benchmarks. "
+        "Point the API at it with OLLAMA_URL=http://<host>:<port>/api/generate."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=11435)
+        parser.add_argument('--latency', type=float, default=0.2, help="Seconds before the first token.")
+        parser.add_argument('--token-rate', type=float, default=50.0, help="Tokens streamed per second (0 for no delay).")
+
+    def handle(self, *args, **options):
+        server = StubOllamaServer((options['host'], options['port']),
+                                  latency=options['latency'], token_rate=options['token_rate'])
+        self.stdout.write(f"Stub Ollama listening on {server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_remove_recipe_image_url_recipe_cost'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'title'], name='api_recipe_user_title_idx'),
+        ),
+    ]
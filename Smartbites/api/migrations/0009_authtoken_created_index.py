@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+INDEX = models.Index(fields=['created'], name='authtoken_token_created_idx')
+
+
+def add_index(apps, schema_editor):
+    Token = apps.get_model('authtoken', 'Token')
+    schema_editor.add_index(Token, INDEX)
+
+
+def remove_index(apps, schema_editor):
+    Token = apps.get_model('authtoken', 'Token')
+    schema_editor.remove_index(Token, INDEX)
+
+
+class Migration(migrations.Migration):
+    """
+    Index authtoken_token.created so expired tokens can be purged in index order.
+    Superseded by 0012, which moves the expiry to api_tokenexpiry and drops this index.
+    """
+
+    dependencies = [
+        ('api', '0008_recipe_user_title_idx'),
+        ('authtoken', '0003_tokenproxy'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_index, remove_index),
+    ]
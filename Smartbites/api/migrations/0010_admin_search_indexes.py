@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_authtoken_created_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='full_name',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['title'], name='api_recipe_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['saved_at'], name='api_recipe_saved_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['dietary_preference'], name='api_profile_diet_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:53
+
+from django.core.management import call_command
+from django.db import migrations, models
+
+
+def create_cache_tables(apps, schema_editor):
+    # Creates the table of every DatabaseCache (the 'shared' cache without Redis);
+    # tables that already exist are left alone
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthFailureCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.RunPython(create_cache_tables, migrations.RunPython.noop),
+    ]
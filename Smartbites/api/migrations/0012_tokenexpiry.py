@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Added to authtoken_token by 0009; the expiry lookups now use api_tokenexpiry.refreshed_at
+OLD_INDEX = models.Index(fields=['created'], name='authtoken_token_created_idx')
+
+
+def backfill_expiry(apps, schema_editor):
+    # Until now the sliding expiry was stored in Token.created
+    Token = apps.get_model('authtoken', 'Token')
+    TokenExpiry = apps.get_model('api', 'TokenExpiry')
+    db = schema_editor.connection.alias
+    tokens = Token.objects.using(db).values_list('key', 'created').iterator(chunk_size=1000)
+    TokenExpiry.objects.using(db).bulk_create(
+        (TokenExpiry(token_id=key, refreshed_at=created) for key, created in tokens), batch_size=1000)
+
+
+def restore_token_created(apps, schema_editor):
+    Token = apps.get_model('authtoken', 'Token')
+    TokenExpiry = apps.get_model('api', 'TokenExpiry')
+    db = schema_editor.connection.alias
+    for expiry in TokenExpiry.objects.using(db).iterator(chunk_size=1000):
+        Token.objects.using(db).filter(pk=expiry.token_id).update(created=expiry.refreshed_at)
+
+
+def drop_old_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model('authtoken', 'Token'), OLD_INDEX)
+
+
+def restore_old_index(apps, schema_editor):
+    schema_editor.add_index(apps.get_model('authtoken', 'Token'), OLD_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_auth_failure_counters_and_shared_cache'),
+        ('authtoken', '0003_tokenproxy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenExpiry',
+            fields=[
+                ('token', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='expiry', serialize=False, to='authtoken.token')),
+                ('refreshed_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_expiry, restore_token_created),
+        migrations.RunPython(drop_old_index, restore_old_index),
+    ]
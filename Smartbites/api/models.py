@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.conf import settings
+from rest_framework.authtoken.models import Token
 
 # Custom User Manager
 class CustomUserManager(BaseUserManager):
@@ -13,6 +14,15 @@ class CustomUserManager(BaseUserManager):
         user.save(using=self._db)
         return user
 
+    def create_user_with_password_hash(self, email, password_hash, full_name=None, **extra_fields):
+        """Create a user whose password was already hashed (e.g. on the hashing pool)"""
+        if not email:
+            raise ValueError('The Email field must be set')
+        email = self.normalize_email(email)
+        user = self.model(email=email, full_name=full_name, password=password_hash, **extra_fields)
+        user.save(using=self._db)
+        return user
+
     def create_superuser(self, email, password=None, full_name="Admin", **extra_fields):
         extra_fields.setdefault('is_staff', True)
         extra_fields.setdefault('is_superuser', True)
@@ -21,7 +31,7 @@ class CustomUserManager(BaseUserManager):
 # Custom User Model
 class CustomUser(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(unique=True)
-    full_name = models.CharField(max_length=255, blank=True, null=True)  # Add this
+    full_name = models.CharField(max_length=255, blank=True, null=True, db_index=True)  # Add this
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
 
@@ -49,6 +59,12 @@ class UserProfile(models.Model):
     allergies = models.TextField(blank=True, null=True)
     budget = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Admin filter
+            models.Index(fields=['dietary_preference'], name='api_profile_diet_idx'),
+        ]
+
     def __str__(self):
         return self.user.email  # Use email since username is removed
 
@@ -61,5 +77,33 @@ class Recipe(models.Model):
     cost = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
     saved_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Duplicate checks look recipes up by owner and title
+            models.Index(fields=['user', 'title'], name='api_recipe_user_title_idx'),
+            # Admin title search and saved date filter
+            models.Index(fields=['title'], name='api_recipe_title_idx'),
+            models.Index(fields=['saved_at'], name='api_recipe_saved_at_idx'),
+        ]
+
     def __str__(self):
         return self.title
+
+# Failed-attempt throttling (see api/passwords.py), used when the shared cache
+# cannot increment atomically across workers
+class AuthFailureCounter(models.Model):
+    key = models.CharField(max_length=100, unique=True)
+    count = models.PositiveIntegerField(default=0)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f'{self.key}: {self.count}'
+
+# Sliding token expiry (see api/authentication.py). Kept in our own table rather
+# than by rewriting authtoken_token.created, which stays the time the token was issued.
+class TokenExpiry(models.Model):
+    token = models.OneToOneField(Token, on_delete=models.CASCADE, primary_key=True, related_name='expiry')
+    refreshed_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f'{self.token_id}: {self.refreshed_at}'
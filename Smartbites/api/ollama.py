@@ -0,0 +1,250 @@
+import contextvars
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from decimal import Decimal
+
+import requests
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+
+from . import instrumentation
+from .serializers import RecipeSerializer
+
+MEALS = ['breakfast', 'lunch', 'dinner']
+
+RECIPE_FORMAT_PROMPT = (
+    'Respond only with a JSON object of the form '
+    '{"title": string, "ingredients": [string], "instructions": [string], "cost": number}, '
+    'where cost is the estimated total cost in pesos.'
+)
+
+
+def profile_summary(profile):
+    """Describe the user's diet, allergies and budget for the prompt."""
+    profile_info_parts = []
+    if profile:
+        if profile.dietary_preference:
+            profile_info_parts.append(f"Diet: {profile.dietary_preference}")
+        if profile.allergies:
+            profile_info_parts.append(f"Allergies: {profile.allergies}")
+        if profile.budget is not None:
+            profile_info_parts.append(f"Monthly Budget: ₱{profile.budget}")
+    return ". ".join(profile_info_parts)
+
+
+# Streamed chat replies
+def open_stream(payload):
+    """Start a streamed generation; raises requests.RequestException if Ollama refuses it."""
+    response = requests.post(settings.OLLAMA_URL, json={**payload, "stream": True}, stream=True,
+                             timeout=settings.OLLAMA_TIMEOUT)
+    try:
+        response.raise_for_status()
+    except requests.RequestException:
+        response.close()
+        raise
+    return response
+
+
+def stream_text(response, started):
+    """
+    Yield the text of a streamed generation piece by piece, closing the response
+    at the end. Records the ttft and generation phases, counted from `started`.
+    """
+    first_token = None
+    with response:
+        for line in response.iter_lines():
+            if not line:
+                continue
+            if first_token is None:
+                first_token = time.perf_counter()
+                instrumentation.record_phase("ttft", first_token - started)
+            chunk = json.loads(line)
+            if chunk.get("response"):
+                yield chunk["response"]
+            if chunk.get("done"):
+                break
+    instrumentation.record_phase("generation", time.perf_counter() - (first_token or started))
+
+
+# Structured recipe generation
+def generate_recipe(prompt):
+    """
+    Ask the model for one JSON recipe and parse the stream as it arrives.
+
+    Returns the decoded object as soon as it is complete; leaving the `with`
+    block closes the connection, so the model stops generating trailing tokens.
+    """
+    payload = {
+        "model": settings.OLLAMA_MODEL,
+        "prompt": prompt,
+        "format": "json",
+        "stream": True,
+    }
+    decoder = json.JSONDecoder()
+    text = ""
+    started = time.perf_counter()
+    first_token = None
+    with requests.post(settings.OLLAMA_URL, json=payload, stream=True, timeout=settings.OLLAMA_TIMEOUT) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            if first_token is None:
+                first_token = time.perf_counter()
+                instrumentation.record_phase("ttft", first_token - started)
+            chunk = json.loads(line)
+            piece = chunk.get("response", "")
+            text += piece
+            # Only try to decode when the new piece could have closed the object
+            if "}" in piece:
+                start = text.find("{")
+                if start != -1:
+                    try:
+                        recipe, _ = decoder.raw_decode(text, start)
+                    except ValueError:
+                        pass
+                    else:
+                        instrumentation.record_phase("generation", time.perf_counter() - first_token)
+                        return recipe
+            if chunk.get("done"):
+                break
+    raise ValueError("The model did not return a complete JSON recipe.")
+
+
+def _as_text(value):
+    if isinstance(value, list):
+        return "\n".join(str(item) for item in value)
+    return value
+
+
+def clean_recipe(raw):
+    """Validate a generated recipe with RecipeSerializer and return its fields."""
+    if not isinstance(raw, dict):
+        raise ValidationError({"non_field_errors": ["Expected a JSON object."]})
+    data = {
+        "title": raw.get("title"),
+        "ingredients": _as_text(raw.get("ingredients")),
+        "instructions": _as_text(raw.get("instructions")),
+        "cost": raw.get("cost"),
+    }
+    if isinstance(data["cost"], float):
+        data["cost"] = str(round(data["cost"], 2))
+    return RecipeSerializer().run_validation(data)
+
+
+def daily_budget(profile):
+    if profile is None or profile.budget is None:
+        return None
+    return (profile.budget / 30).quantize(Decimal("0.01"))
+
+
+def check_recipe(fields, profile):
+    """List the ways a recipe conflicts with the profile's allergies and budget."""
+    problems = []
+    if profile is not None and profile.allergies:
+        text = f"{fields['title']}\n{fields['ingredients']}".lower()
+        for allergen in profile.allergies.replace(";", ",").replace("\n", ",").split(","):
+            allergen = allergen.strip().lower()
+            if allergen and allergen in text:
+                problems.append(f"Contains allergen: {allergen}")
+    limit = daily_budget(profile)
+    if limit is not None and fields.get("cost") is not None and fields["cost"] > limit:
+        problems.append(f"Costs more than the daily budget of ₱{limit}")
+    return problems
+
+
+# Meal plans
+def meal_plan_prompt(profile, day, days, meal, prompt):
+    parts = [
+        profile_summary(profile),
+        f"Create a {meal} recipe for day {day} of a {days}-day meal plan",
+        prompt,
+        RECIPE_FORMAT_PROMPT,
+    ]
+    return ". ".join(part.strip().rstrip(".") for part in parts if part and part.strip()) + "."
+
+
+def _plan_entry(profile, day, days, meal, prompt):
+    entry = {"day": day, "meal": meal}
+    try:
+        fields = clean_recipe(generate_recipe(meal_plan_prompt(profile, day, days, meal, prompt)))
+    except ValidationError as e:
+        entry.update(status="error", errors=e.detail)
+        return entry
+    except (requests.RequestException, ValueError) as e:
+        entry.update(status="error", errors={"non_field_errors": [str(e)]})
+        return entry
+    problems = check_recipe(fields, profile)
+    entry.update(status="rejected" if problems else "ok", problems=problems, fields=fields)
+    return entry
+
+
+_pool_lock = threading.Lock()
+_executor = None
+
+
+def _pool():
+    global _executor
+    with _pool_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.MEAL_PLAN_WORKERS, thread_name_prefix='meal-plan')
+        return _executor
+
+
+def generate_meal_plan(profile, days, meal="dinner", prompt=""):
+    """
+    Generate one recipe per day concurrently and yield each entry as soon as it
+    is ready, in completion order.
+
+    A plan keeps at most settings.MEAL_PLAN_PARALLELISM days in flight, and all
+    plans of this process share settings.MEAL_PLAN_WORKERS threads, which bounds
+    the generations sent to Ollama at once however many plans are requested.
+    """
+    executor = _pool()
+    remaining = iter(range(1, days + 1))
+    running = set()
+
+    def submit_next():
+        day = next(remaining, None)
+        if day is not None:
+            # Each worker runs in a copy of the request context so its phases are recorded
+            running.add(executor.submit(
+                contextvars.copy_context().run, _plan_entry, profile, day, days, meal, prompt))
+
+    try:
+        for _ in range(min(settings.MEAL_PLAN_PARALLELISM, days)):
+            submit_next()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                running.discard(future)
+                submit_next()
+                yield future.result()
+    finally:
+        # Stop queued generations if the caller goes away early
+        for future in running:
+            future.cancel()
+
+
+def entry_data(entry):
+    """JSON-ready copy of a meal plan entry."""
+    data = {key: value for key, value in entry.items() if key != "fields"}
+    if "fields" in entry:
+        data["recipe"] = RecipeSerializer().to_representation(entry["fields"])
+    return data
+
+
+def plan_summary(profile, days, entries):
+    accepted = [entry for entry in entries if entry["status"] == "ok"]
+    total_cost = sum((entry["fields"].get("cost") or Decimal("0") for entry in accepted), Decimal("0"))
+    limit = daily_budget(profile)
+    return {
+        "days": days,
+        "accepted": len(accepted),
+        "rejected": sum(1 for entry in entries if entry["status"] == "rejected"),
+        "failed": sum(1 for entry in entries if entry["status"] == "error"),
+        "total_cost": f"{total_cost:.2f}",
+        "within_budget": None if limit is None else total_cost <= limit * days,
+    }
@@ -0,0 +1,176 @@
+"""
+Password hashing off the request threads, and shared throttling of failed
+attempts so abusive clients are rejected before any hashing is done.
+
+The request thread still waits for its hash: the pool bounds how many hashes
+a process runs at once, which protects other endpoints only when the process
+serves requests on several threads (see PASSWORD_HASHING_* in settings).
+Failure counters live where every worker sees them: the 'shared' cache when
+it is Redis or memcached, otherwise AuthFailureCounter rows.
+"""
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.cache import caches
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import AuthFailureCounter
+
+
+class HashingUnavailable(Exception):
+    """The hashing pool is saturated (or too slow); the client should retry later."""
+
+
+# Hashing pool
+_pool_lock = threading.Lock()
+_executor = None
+_slots = None
+
+
+def _pool():
+    global _executor, _slots
+    with _pool_lock:
+        if _executor is None:
+            # hashlib releases the GIL while deriving keys, so threads hash in parallel
+            workers = settings.PASSWORD_HASHING_WORKERS
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+            _slots = threading.BoundedSemaphore(workers + settings.PASSWORD_HASHING_QUEUE)
+        return _executor, _slots
+
+
+def run(func, *args):
+    """Run a hashing function on the pool and wait for it, refusing when the queue is full."""
+    executor, slots = _pool()
+    if not slots.acquire(blocking=False):
+        raise HashingUnavailable()
+    try:
+        future = executor.submit(func, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=settings.PASSWORD_HASHING_TIMEOUT)
+    except TimeoutError:
+        raise HashingUnavailable()
+
+
+def make_password(raw_password):
+    return run(hashers.make_password, raw_password)
+
+
+def _needs_rehash(encoded):
+    preferred = hashers.get_hasher('default')
+    try:
+        hasher = hashers.identify_hasher(encoded)
+    except ValueError:
+        return False
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def verify(user, raw_password):
+    """
+    Check a password on the pool. Unknown users still pay for one hash so
+    response times don't reveal which emails exist. A correct password stored
+    with outdated hasher settings is re-hashed with the current ones.
+    """
+    if user is None or not raw_password:
+        run(hashers.make_password, raw_password or '')
+        return False
+    if not run(hashers.check_password, raw_password, user.password):
+        return False
+    if _needs_rehash(user.password):
+        user.password = make_password(raw_password)
+        user.save(update_fields=['password'])
+    return True
+
+
+# Failed-attempt throttling
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _keys(email, ip):
+    keys = {}
+    if isinstance(email, str) and email:
+        keys['email'] = 'auth-fail:email:' + hashlib.sha256(email.strip().lower().encode()).hexdigest()
+    if ip:
+        keys['ip'] = 'auth-fail:ip:' + ip
+    return keys
+
+
+def _atomic_cache():
+    """
+    The shared cache when its incr() is a single atomic server-side operation
+    (Redis, memcached), else None: counters then live in AuthFailureCounter rows,
+    since DatabaseCache.incr() is a read followed by a write and loses updates.
+    """
+    cache = caches['shared']
+    return cache if isinstance(cache, (RedisCache, BaseMemcachedCache)) else None
+
+
+def _counts(keys):
+    cache = _atomic_cache()
+    if cache is not None:
+        return cache.get_many(keys)
+    return dict(
+        AuthFailureCounter.objects.filter(key__in=keys, expires_at__gt=timezone.now()).values_list('key', 'count')
+    )
+
+
+def _increment(key):
+    cache = _atomic_cache()
+    if cache is not None:
+        cache.add(key, 0, settings.AUTH_FAILURE_WINDOW)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.set(key, 1, settings.AUTH_FAILURE_WINDOW)
+        return
+
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=settings.AUTH_FAILURE_WINDOW)
+    counters = AuthFailureCounter.objects.filter(key=key)
+    while True:
+        # Each step is one atomic statement, so concurrent failures are all counted
+        if counters.filter(expires_at__gt=now).update(count=F('count') + 1):
+            return
+        if counters.filter(expires_at__lte=now).update(count=1, expires_at=expires_at):
+            return  # Restarted an expired window
+        try:
+            with transaction.atomic():
+                AuthFailureCounter.objects.create(key=key, count=1, expires_at=expires_at)
+            return
+        except IntegrityError:
+            pass  # Another request opened the window first; count on it
+
+
+def is_throttled(email=None, ip=None):
+    """True once the email or IP has reached its failed-attempt limit for the current window."""
+    keys = _keys(email, ip)
+    counts = _counts(list(keys.values()))
+    limits = {'email': settings.AUTH_FAILURES_PER_EMAIL, 'ip': settings.AUTH_FAILURES_PER_IP}
+    return any(counts.get(key, 0) >= limits[kind] for kind, key in keys.items())
+
+
+def record_failure(email=None, ip=None):
+    for key in _keys(email, ip).values():
+        _increment(key)
+
+
+def clear_failures(email):
+    keys = list(_keys(email, None).values())
+    cache = _atomic_cache()
+    if cache is not None:
+        cache.delete_many(keys)
+    else:
+        AuthFailureCounter.objects.filter(key__in=keys).delete()
@@ -0,0 +1,30 @@
+from rest_framework.renderers import JSONRenderer
+
+
+def columnar(data):
+    """
+    Rewrite a list of objects as {"fields": [...], "rows": [[...], ...]} so
+    field names are sent once instead of once per item. Anything else, and
+    lists whose items do not share the same fields, is returned unchanged.
+    """
+    if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
+        return data
+    fields = list(data[0]) if data else []
+    if any(list(item) != fields for item in data):
+        return data
+    return {'fields': fields, 'rows': [list(item.values()) for item in data]}
+
+
+class CompactJSONRenderer(JSONRenderer):
+    """
+    Minified JSON with list responses in columnar form (see columnar()),
+    for clients that ask for it with Accept: application/vnd.smartbites.compact+json.
+    """
+    media_type = 'application/vnd.smartbites.compact+json'
+    format = 'compact'
+
+    def get_indent(self, accepted_media_type, renderer_context):
+        return None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(columnar(data), accepted_media_type, renderer_context)
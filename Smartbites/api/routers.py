@@ -0,0 +1,122 @@
+import hashlib
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from rest_framework.authtoken.models import Token
+
+from .models import TokenExpiry
+
+PRIMARY = 'default'
+
+# Routing state of the request being handled; None outside of a request
+# (management commands, shell, tests without a client), which always uses the primary.
+_routing = ContextVar('db_routing', default=None)
+
+
+def _database_identity(settings_dict):
+    return tuple(settings_dict.get(key) for key in ('ENGINE', 'NAME', 'HOST', 'PORT'))
+
+
+def _replicas():
+    """
+    Configured replicas, minus any that resolve to the primary's own database
+    (e.g. test mirrors): those share its data but not its open transaction.
+    """
+    primary = _database_identity(connections[PRIMARY].settings_dict)
+    return [
+        alias for alias in settings.DATABASE_REPLICAS
+        if alias not in connections.settings or _database_identity(connections[alias].settings_dict) != primary
+    ]
+
+
+class RoutingState:
+    def __init__(self):
+        self.read_from_replica = False
+        self.wrote = False
+        # Keys of tokens saved during the request (login, register), so the
+        # client that receives one is sticky too although it sent no header
+        self.issued_tokens = set()
+
+
+def note_issued_token(key):
+    """Make the client that receives this token sticky along with the request's own client."""
+    state = _routing.get()
+    if state is not None:
+        state.issued_tokens.add(key)
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends reads from replica-safe views (settings.REPLICA_READ_VIEWS) to a
+    random replica and everything else to the primary. Once a request has
+    written, the rest of it reads from the primary too (read-your-writes).
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        replicas = _replicas()
+        # Tokens are always checked on the primary so a fresh login is never rejected by replica lag
+        if state is None or not replicas or model in (Token, TokenExpiry):
+            return PRIMARY
+        if state.read_from_replica and not state.wrote:
+            return random.choice(replicas)
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Tracks per-request routing state for PrimaryReplicaRouter.
+
+    A client that has just written (identified by its Authorization header,
+    or by the token the request issued it) keeps reading from the primary for
+    settings.REPLICA_STICKY_SECONDS. The flag lives in the 'shared' cache so
+    every worker honours it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState()
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+
+        if state.wrote and settings.DATABASE_REPLICAS:
+            authorizations = [request.META.get('HTTP_AUTHORIZATION')]
+            authorizations += ['Token ' + key for key in state.issued_tokens]
+            sticky_keys = [_sticky_key(authorization) for authorization in authorizations if authorization]
+            if sticky_keys:
+                caches['shared'].set_many(dict.fromkeys(sticky_keys, True), settings.REPLICA_STICKY_SECONDS)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _routing.get()
+        match = request.resolver_match
+        if (state is None or not settings.DATABASE_REPLICAS or request.method not in ('GET', 'HEAD')
+                or match is None or match.url_name not in settings.REPLICA_READ_VIEWS):
+            return None
+        authorization = request.META.get('HTTP_AUTHORIZATION')
+        state.read_from_replica = not (authorization and caches['shared'].get(_sticky_key(authorization)))
+        return None
+
+
+def _sticky_key(authorization):
+    return 'db-sticky:' + hashlib.sha256(authorization.encode()).hexdigest()
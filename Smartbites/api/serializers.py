@@ -20,6 +20,134 @@ class RecipeSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'ingredients', 'instructions', 'cost', 'saved_at']
         read_only_fields = ['id']
 
+# Fast read path for recipe lists
+import datetime
+import decimal
+from json.encoder import encode_basestring
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+from django.utils import timezone
+from rest_framework.settings import api_settings
+from rest_framework.fields import ISO_8601
+
+class RecipeListEncoder:
+    """
+    Renders rows fetched with values_list() into the same JSON bytes that
+    JSONRenderer produces for RecipeSerializer(..., many=True).
+
+    The per-column encoders are resolved once from the model schema, so
+    rendering a row is a single string format with no model instances and
+    no DRF field machinery.
+    """
+
+    def __init__(self, serializer_class):
+        meta = serializer_class.Meta
+        if serializer_class._declared_fields:
+            raise ImproperlyConfigured(
+                f"{serializer_class.__name__} declares custom fields; the fast encoder only supports model fields."
+            )
+        if not (api_settings.COMPACT_JSON and api_settings.UNICODE_JSON and api_settings.COERCE_DECIMAL_TO_STRING):
+            raise ImproperlyConfigured("RecipeListEncoder requires compact unicode JSON with string decimals.")
+        if api_settings.DATETIME_FORMAT.lower() != ISO_8601:
+            raise ImproperlyConfigured("RecipeListEncoder only supports ISO 8601 datetimes.")
+
+        self.fields = tuple(meta.fields)
+        self._model_fields = [meta.model._meta.get_field(name) for name in self.fields]
+        for field in self._model_fields:
+            if not isinstance(field, (models.IntegerField, models.CharField, models.TextField,
+                                      models.DecimalField, models.DateTimeField)):
+                raise ImproperlyConfigured(f"Unsupported field type for {field.name}: {type(field).__name__}")
+        self._template = '{' + ','.join(f'{encode_basestring(name)}:%s' for name in self.fields) + '}'
+        self._row_template = '[' + ','.join(['%s'] * len(self.fields)) + ']'
+        self._columns_prefix = '{"fields":[' + ','.join(encode_basestring(name) for name in self.fields) + '],"rows":['
+
+    def _column_encoders(self):
+        """Build one encoder per column; the timezone is looked up once per render."""
+        field_timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+        encoders = []
+        for field in self._model_fields:
+            if isinstance(field, models.DecimalField):
+                encoders.append(_decimal_encoder(field))
+            elif isinstance(field, models.DateTimeField):
+                encoders.append(_datetime_encoder(field_timezone))
+            elif isinstance(field, (models.CharField, models.TextField)):
+                encoders.append(_string_encoder)
+            else:
+                encoders.append(_int_encoder)
+        return encoders
+
+    def encode_row(self, row, encoders=None):
+        encoders = encoders or self._column_encoders()
+        return self._template % tuple([encode(value) for encode, value in zip(encoders, row)])
+
+    def render(self, rows):
+        """Render an iterable of values_list() tuples to a JSON array (bytes)."""
+        encoders = self._column_encoders()
+        template = self._template
+        body = '[' + ','.join(
+            template % tuple([encode(value) for encode, value in zip(encoders, row)])
+            for row in rows
+        ) + ']'
+        return _escape_line_separators(body).encode()
+
+    def render_compact(self, rows):
+        """Render values_list() tuples in the columnar form of CompactJSONRenderer (bytes)."""
+        encoders = self._column_encoders()
+        template = self._row_template
+        body = self._columns_prefix + ','.join(
+            template % tuple([encode(value) for encode, value in zip(encoders, row)])
+            for row in rows
+        ) + ']}'
+        return _escape_line_separators(body).encode()
+
+    def render_lines(self, rows):
+        """Yield one NDJSON line (bytes) per values_list() tuple."""
+        encoders = self._column_encoders()
+        for row in rows:
+            yield (_escape_line_separators(self.encode_row(row, encoders)) + '\n').encode()
+
+
+def _escape_line_separators(text):
+    # Same escaping JSONRenderer applies to keep the output a strict JavaScript subset
+    return text.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+
+
+def _string_encoder(value):
+    return 'null' if value is None else encode_basestring(value)
+
+def _int_encoder(value):
+    return 'null' if value is None else '%d' % value
+
+def _decimal_encoder(field):
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    context.prec = field.max_digits
+
+    def encode(value):
+        if value is None:
+            return 'null'
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return f'"{value.quantize(exponent, context=context):f}"'
+    return encode
+
+def _datetime_encoder(field_timezone):
+    def encode(value):
+        if value is None:
+            return 'null'
+        if field_timezone is not None:
+            value = value.astimezone(field_timezone) if timezone.is_aware(value) else timezone.make_aware(value, field_timezone)
+        elif timezone.is_aware(value):
+            value = timezone.make_naive(value, datetime.timezone.utc)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return '"' + value + '"'
+    return encode
+
+recipe_list_encoder = RecipeListEncoder(RecipeSerializer)
+
 # password edit
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
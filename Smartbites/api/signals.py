@@ -1,7 +1,9 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import UserProfile
+from rest_framework.authtoken.models import Token
+from .models import TokenExpiry, UserProfile
+from .routers import note_issued_token
 
 CustomUser = get_user_model()  # Get custom user model
 
@@ -12,6 +14,22 @@ def create_user_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance, dietary_preference='omnivore')  # Set default
 
 @receiver(post_save, sender=CustomUser)
-def save_user_profile(sender, instance, **kwargs):
+def save_user_profile(sender, instance, created, update_fields=None, **kwargs):
     """Save user profile when user updates account"""
+    # Partial saves (last_login, password) and users whose profile was never
+    # loaded have nothing to write back, so skip the extra SELECT + UPDATE.
+    if created or update_fields is not None or not CustomUser.userprofile.is_cached(instance):
+        return
     instance.userprofile.save()
+
+@receiver(post_save, sender=Token)
+def mark_issued_token_sticky(sender, instance, created, **kwargs):
+    """A new token's first reads go to the primary, which has the writes that led to it"""
+    if created:
+        note_issued_token(instance.key)
+
+@receiver(post_save, sender=Token)
+def start_token_expiry(sender, instance, created, **kwargs):
+    """A new token's expiry starts sliding from the moment it was issued"""
+    if created:
+        TokenExpiry.objects.create(token=instance, refreshed_at=instance.created)
@@ -1,3 +1,864 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import re
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import ResolverMatch, reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from .authentication import PURGE_STATS_KEY, is_expired
+from .benchmark import STUB_RECIPE, StubOllamaServer, compare, percentile, queries_from_server_timing
+from . import instrumentation
+from .bulk import export_recipes, import_recipes
+from .compression import brotli, negotiate_encoding
+from .models import AuthFailureCounter, CustomUser, Recipe, TokenExpiry, UserProfile
+from .ollama import generate_meal_plan, generate_recipe
+from .passwords import HashingUnavailable, _keys
+from .routers import PrimaryReplicaRouter, ReplicaRoutingMiddleware
+from .serializers import RecipeSerializer, recipe_list_encoder
+from .urls import urlpatterns
+
+
+# Fast recipe list rendering
+class RecipeListEncoderTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email="cook@example.com", password="s3cret-pass")
+        Recipe.objects.create(user=self.user, title="Adobo", ingredients="chicken, soy sauce", instructions="Simmer.", cost=Decimal("120.5"))
+        Recipe.objects.create(user=self.user, title="Sinigang \"sour\" soup", ingredients="pork\ttamarind", instructions="Boil\nthen\r\nserve", cost=None)
+        Recipe.objects.create(user=self.user, title="Crème brûlée 🍮", ingredients="eggs cream", instructions="Bake chill\x01", cost=Decimal("99999999.99"))
+        Recipe.objects.create(user=self.user, title="Halo-halo\u2028mix\u2029", ingredients="\\ice", instructions="</script>", cost=Decimal("0"))
+
+    def test_matches_recipe_serializer_bytes(self):
+        recipes = Recipe.objects.filter(user=self.user)
+        expected = JSONRenderer().render(RecipeSerializer(recipes, many=True).data)
+        rows = recipes.values_list(*recipe_list_encoder.fields)
+        self.assertEqual(recipe_list_encoder.render(rows), expected)
+
+    def test_empty_list(self):
+        rows = Recipe.objects.none().values_list(*recipe_list_encoder.fields)
+        self.assertEqual(recipe_list_encoder.render(rows), JSONRenderer().render([]))
+
+    def test_get_user_recipes_response_is_unchanged(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+        response = client.get("/api/get-user-recipes/", HTTP_ACCEPT="application/json")
+        expected = JSONRenderer().render(RecipeSerializer(Recipe.objects.filter(user=self.user), many=True).data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response.content, expected)
+
+
+# Bulk import / export
+class RecipeImportExportTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email="bulk@example.com", password="s3cret-pass")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+        Recipe.objects.create(user=self.user, title="Adobo", ingredients="chicken", instructions="Simmer.", cost=Decimal("120"))
+
+    def test_export_streams_ndjson(self):
+        response = self.client.get("/api/export-recipes/")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])["title"], "Adobo")
+
+    def test_import_skips_duplicates_and_reports_errors(self):
+        body = "\n".join([
+            json.dumps({"title": "Adobo", "ingredients": "chicken", "instructions": "Simmer."}),
+            json.dumps({"title": "Tinola", "ingredients": "chicken, ginger", "instructions": "Boil.", "cost": "80.00"}),
+            json.dumps({"title": "Tinola", "ingredients": "chicken, ginger", "instructions": "Boil."}),
+            "{not json",
+            json.dumps({"title": "No instructions"}),
+            "",
+        ])
+        response = self.client.post("/api/import-recipes/", data=body.encode(), content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(response.data["duplicates"], 2)
+        self.assertEqual([error["line"] for error in response.data["errors"]], [4, 5])
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+
+    def test_export_reads_in_keyset_pages(self):
+        Recipe.objects.bulk_create([
+            Recipe(user=self.user, title=f"Recipe {i}", ingredients="rice", instructions="Cook.") for i in range(6)
+        ])
+        with mock.patch("api.bulk.EXPORT_CHUNK_SIZE", 3), CaptureQueriesContext(connection) as queries:
+            lines = list(export_recipes(self.user))
+        self.assertEqual([json.loads(line)["title"] for line in lines],
+                         ["Adobo"] + [f"Recipe {i}" for i in range(6)])
+        self.assertEqual(len(queries), 3)
+        self.assertTrue(all("LIMIT 3" in query["sql"] for query in queries.captured_queries))
+
+    def test_export_then_import_round_trip(self):
+        other = CustomUser.objects.create_user(email="other@example.com", password="s3cret-pass")
+        report = import_recipes(other, export_recipes(self.user), batch_size=1)
+        self.assertEqual(report["created"], 1)
+        self.assertEqual(Recipe.objects.get(user=other).cost, Decimal("120.00"))
+
+
+# Bulk update / multi-delete
+class BulkRecipeChangeTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email="batch@example.com", password="s3cret-pass")
+        self.other = CustomUser.objects.create_user(email="someone@example.com", password="s3cret-pass")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+
+    def make_recipes(self, user, count):
+        return Recipe.objects.bulk_create([
+            Recipe(user=user, title=f"Recipe {i}", ingredients="rice", instructions="Cook.", cost=Decimal("10"))
+            for i in range(count)
+        ])
+
+    def test_bulk_update_runs_fixed_queries(self):
+        for count in (2, 40):
+            recipes = self.make_recipes(self.user, count)
+            payload = {"recipes": [{"id": recipe.id, "cost": "25.50"} for recipe in recipes]}
+            # token lookup, SELECT owned recipes, UPDATE
+            with self.assertNumQueries(3):
+                response = self.client.patch("/api/bulk-update-recipes/", payload, format="json")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data["updated_count"], count)
+        self.assertFalse(Recipe.objects.filter(user=self.user).exclude(cost=Decimal("25.50")).exists())
+
+    def test_bulk_update_is_scoped_to_owner_and_validated(self):
+        mine = self.make_recipes(self.user, 1)[0]
+        theirs = self.make_recipes(self.other, 1)[0]
+        response = self.client.patch("/api/bulk-update-recipes/", {"recipes": [
+            {"id": mine.id, "title": "Renamed"},
+            {"id": theirs.id, "title": "Hijacked"},
+        ]}, format="json")
+        self.assertEqual(response.data["missing_ids"], [theirs.id])
+        self.assertEqual(Recipe.objects.get(id=theirs.id).title, "Recipe 0")
+
+        response = self.client.patch("/api/bulk-update-recipes/", {"recipes": [
+            {"id": mine.id, "cost": "not a number"},
+        ]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("cost", response.data["errors"][0])
+
+    def test_multi_delete_reports_removed_ids(self):
+        mine = self.make_recipes(self.user, 30)
+        theirs = self.make_recipes(self.other, 1)[0]
+        ids = [recipe.id for recipe in mine] + [theirs.id, 999999]
+        with self.assertNumQueries(2):
+            response = self.client.post("/api/delete-multiple-recipes/", {"recipe_ids": ids}, format="json")
+        self.assertEqual(response.data["deleted_count"], 30)
+        self.assertEqual(response.data["valid_ids"], sorted(recipe.id for recipe in mine))
+        self.assertTrue(Recipe.objects.filter(id=theirs.id).exists())
+
+
+# Read-replica routing
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = PrimaryReplicaRouter()
+
+    def route(self, method, url_name, write=False, authorization="Token abc"):
+        """Run a request through the middleware and return the alias its reads use."""
+        request = self.factory.generic(method, "/", HTTP_AUTHORIZATION=authorization)
+        request.resolver_match = ResolverMatch(lambda request: None, (), {}, url_name=url_name)
+        seen = {}
+
+        def view(request):
+            middleware.process_view(request, None, (), {})
+            if write:
+                self.router.db_for_write(Recipe)
+            seen["read"] = self.router.db_for_read(Recipe)
+            seen["token"] = self.router.db_for_read(Token)
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(view)
+        middleware(request)
+        return seen
+
+    @override_settings(DATABASE_REPLICAS=["stand_in"], REPLICA_STICKY_SECONDS=60)
+    def test_listing_reads_go_to_replica(self):
+        caches["shared"].clear()
+        seen = self.route("GET", "get_user_recipes")
+        self.assertEqual(seen, {"read": "stand_in", "token": "default"})
+        self.assertEqual(self.route("GET", "save_recipe")["read"], "default")
+        self.assertEqual(self.route("POST", "get_user_recipes")["read"], "default")
+
+    @override_settings(DATABASE_REPLICAS=["stand_in"], REPLICA_STICKY_SECONDS=60)
+    def test_writes_stick_to_primary(self):
+        caches["shared"].clear()
+        self.assertEqual(self.route("GET", "get_user_recipes", write=True)["read"], "default")
+        # The same client keeps reading from the primary for a while, others do not
+        self.assertEqual(self.route("GET", "get_user_recipes")["read"], "default")
+        self.assertEqual(self.route("GET", "get_user_recipes", authorization="Token xyz")["read"], "stand_in")
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_primary(self):
+        self.assertEqual(self.route("GET", "get_user_recipes")["read"], "default")
+        self.assertEqual(self.router.db_for_read(Recipe), "default")
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"], REPLICA_STICKY_SECONDS=60)
+class SQLiteReplicaTests(TestCase):
+    """Routes real requests between the primary and a separate, migrated SQLite replica."""
+
+    @classmethod
+    def setUpClass(cls):
+        # Not a test mirror: the replica is its own database, so it can hold different rows.
+        # It is added here rather than in settings so the test runs whatever the primary is.
+        configured = connections.configure_settings({
+            "default": connections.settings["default"],
+            "replica1": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"},
+        })
+        connections.settings["replica1"] = configured["replica1"]
+        call_command("migrate", database="replica1", verbosity=0)
+        cls.databases = {"default", "replica1"}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections["replica1"].close()
+        del connections["replica1"]
+        del connections.settings["replica1"]
+
+    def setUp(self):
+        caches["shared"].clear()
+        self.user = CustomUser.objects.create_user(email="replica@example.com", password="s3cret-pass")
+        # "Replicate" the user without signals, which would write the profile to the primary again
+        CustomUser.objects.using("replica1").bulk_create([
+            CustomUser(pk=self.user.pk, email=self.user.email, password=self.user.password)])
+        self.token = Token.objects.create(user=self.user)
+        Recipe.objects.create(user=self.user, title="From primary", ingredients="rice", instructions="Cook.")
+        Recipe(user=self.user, title="From replica", ingredients="rice", instructions="Cook.").save(using="replica1")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+    def list_titles(self):
+        with CaptureQueriesContext(connections["replica1"]) as replica_queries:
+            response = self.client.get("/api/get-user-recipes/")
+        self.assertEqual(response.status_code, 200)
+        return [recipe["title"] for recipe in response.json()], len(replica_queries)
+
+    def test_listing_is_served_by_the_replica(self):
+        self.assertEqual(self.list_titles(), (["From replica"], 1))
+
+    def test_write_moves_reads_to_primary_for_the_request_and_sticky_window(self):
+        # Authenticating with a token older than TOKEN_REFRESH_INTERVAL slides its expiry: a write
+        TokenExpiry.objects.filter(token=self.token).update(refreshed_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(self.list_titles(), (["From primary"], 0))
+        # No write this time, but the client is still inside its sticky window
+        self.assertEqual(self.list_titles(), (["From primary"], 0))
+        caches["shared"].clear()  # Window over
+        self.assertEqual(self.list_titles(), (["From replica"], 1))
+
+    def test_token_issued_at_login_is_sticky(self):
+        # The login request carries no token header; the one it hands out must still read from the primary
+        Token.objects.filter(pk=self.token.pk).delete()
+        response = APIClient().post("/api/login/", {"email": "replica@example.com", "password": "s3cret-pass"},
+                                    format="json")
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + response.data["token"])
+        self.assertEqual(self.list_titles(), (["From primary"], 0))
+
+    def test_profile_missing_on_a_lagging_replica_is_read_from_the_primary(self):
+        # The replica has the user but not yet the profile the signup created on the primary
+        self.assertFalse(UserProfile.objects.using("replica1").exists())
+        response = self.client.get("/api/profile/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get("/api/current-user/").data["email"], "replica@example.com")
+
+
+# Meal plans
+class FakeOllamaStream:
+    """Stands in for a streamed /api/generate response, one token per NDJSON line."""
+
+    status_code = 200
+
+    def __init__(self, text, delay=0):
+        self.text = text
+        self.delay = delay
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self):
+        time.sleep(self.delay)
+        for token in self.text.split(" "):
+            yield json.dumps({"response": token + " ", "done": False}).encode()
+        yield json.dumps({"response": "", "done": True}).encode()
+
+
+class MealPlanTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email="planner@example.com", password="s3cret-pass")
+        self.user.userprofile.allergies = "peanuts, shrimp"
+        self.user.userprofile.budget = Decimal("3000")
+        self.user.userprofile.save()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+
+    def fake_generate(self, url, json=None, **kwargs):
+        day = int(json["prompt"].split("for day ")[1].split(" ")[0])
+        ingredients = '["shrimp", "rice"]' if day == 2 else '["chicken", "rice"]'
+        return FakeOllamaStream(
+            '{"title": "Meal %d", "ingredients": %s, "instructions": ["Cook."], "cost": %d} trailing tokens'
+            % (day, ingredients, 50 + day),
+            delay=0.2,
+        )
+
+    @override_settings(MEAL_PLAN_PARALLELISM=7)
+    def test_generates_days_in_parallel_and_checks_profile(self):
+        started = time.monotonic()
+        with mock.patch("api.ollama.requests.post", side_effect=self.fake_generate):
+            response = self.client.post("/api/meal-plan/", {"days": 7, "save": True}, format="json")
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual([entry["day"] for entry in response.data["plan"]], list(range(1, 8)))
+        self.assertEqual(response.data["plan"][1]["status"], "rejected")
+        self.assertEqual(response.data["plan"][1]["problems"], ["Contains allergen: shrimp"])
+        self.assertEqual(response.data["plan"][0]["recipe"]["ingredients"], "chicken\nrice")
+        self.assertEqual(response.data["summary"]["accepted"], 6)
+        self.assertEqual(response.data["summary"]["saved_count"], 6)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 6)
+
+    def test_streams_entries_then_summary(self):
+        with mock.patch("api.ollama.requests.post", side_effect=self.fake_generate):
+            response = self.client.post("/api/meal-plan/", {"days": 3, "stream": True}, format="json")
+            lines = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(sorted(line["day"] for line in lines[:-1]), [1, 2, 3])
+        self.assertEqual(lines[-1]["summary"]["days"], 3)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_rejects_invalid_days(self):
+        response = self.client.post("/api/meal-plan/", {"days": 99}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_non_string_prompt(self):
+        response = self.client.post("/api/meal-plan/", {"days": 2, "prompt": {"cuisine": "thai"}}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(MEAL_PLAN_PARALLELISM=2)
+    def test_plans_share_one_bounded_pool(self):
+        in_flight, peak, lock = [0], [0], threading.Lock()
+
+        def counting_generate(prompt):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.05)
+            with lock:
+                in_flight[0] -= 1
+            return {"title": prompt[-30:], "ingredients": "rice", "instructions": "Cook.", "cost": 10}
+
+        with ThreadPoolExecutor(max_workers=3) as shared, mock.patch("api.ollama._executor", shared), \
+                mock.patch("api.ollama.generate_recipe", side_effect=counting_generate):
+            plans = [generate_meal_plan(None, 4) for _ in range(3)]
+            with ThreadPoolExecutor(max_workers=3) as clients:
+                results = list(clients.map(list, plans))
+        self.assertEqual([len(plan) for plan in results], [4, 4, 4])
+        self.assertLessEqual(peak[0], 3)
+
+
+# Instrumentation
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email="timed@example.com", password="s3cret-pass")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+
+    def test_server_timing_reports_queries(self):
+        response = self.client.get("/api/get-user-recipes/")
+        timing = response["Server-Timing"]
+        self.assertTrue(timing.startswith("total;dur="))
+        self.assertIn('desc="2 queries"', timing)
+
+    def test_query_ollama_records_llm_phases(self):
+        def fake_post(url, json=None, **kwargs):
+            return FakeOllamaStream("Try adobo tonight")
+
+        with mock.patch("api.views.requests.post", side_effect=fake_post):
+            response = self.client.post("/api/query-ollama/", {"prompt": "Dinner idea?"}, format="json")
+        self.assertEqual(response.data["response"], "Try adobo tonight")
+        phases = [entry.split(";")[0] for entry in response["Server-Timing"].split(", ")]
+        self.assertEqual(phases, ["total", "db", "prompt_build", "image_encode", "ttft", "generation", "parse"])
+
+    def test_streamed_reply_is_observed_when_the_stream_closes(self):
+        def observed(body, series):
+            match = re.search(re.escape(series) + r" (\S+)", body)
+            return float(match.group(1)) if match else 0
+
+        duration = 'smartbites_request_duration_seconds_count{method="POST",view="query_ollama"}'
+        ttft = 'smartbites_phase_duration_seconds_count{phase="ttft",view="query_ollama"}'
+        before = instrumentation.render_metrics()
+        with mock.patch("requests.post", return_value=FakeOllamaStream("Try adobo tonight", delay=0.05)):
+            response = self.client.post("/api/query-ollama/", {"prompt": "Dinner?", "stream": True}, format="json")
+            self.assertEqual(observed(instrumentation.render_metrics(), duration), observed(before, duration))
+            b"".join(response.streaming_content)
+            response.close()
+        after = instrumentation.render_metrics()
+        self.assertEqual(observed(after, duration), observed(before, duration) + 1)
+        self.assertEqual(observed(after, ttft), observed(before, ttft) + 1)
+        # The sample covers the whole stream, not just the time to the first byte
+        total = 'smartbites_request_duration_seconds_bucket{method="POST",view="query_ollama",le="0.025"}'
+        self.assertEqual(observed(after, total), observed(before, total))
+
+    def test_query_ollama_closes_upstream_on_error(self):
+        class BrokenStream(FakeOllamaStream):
+            closed = False
+
+            def __exit__(self, *exc):
+                BrokenStream.closed = True
+                return False
+
+            def iter_lines(self):
+                yield json.dumps({"response": "Try", "done": False}).encode()
+                raise ConnectionResetError("Connection reset by peer")
+
+        with mock.patch("api.views.requests.post", return_value=BrokenStream("")) as post:
+            response = self.client.post("/api/query-ollama/", {"prompt": "Dinner idea?"}, format="json")
+        self.assertEqual(response.status_code, 500)
+        self.assertTrue(BrokenStream.closed)
+        self.assertEqual(post.call_args.kwargs["timeout"], settings.OLLAMA_TIMEOUT)
+
+    def test_unknown_methods_share_one_label(self):
+        self.client.generic("BREW", "/api/get-user-recipes/")
+        self.client.generic("X-RANDOM-123", "/api/get-user-recipes/")
+        body = self.client.get("/api/metrics/").content.decode()
+        self.assertIn('method="other"', body)
+        self.assertNotIn("BREW", body)
+        self.assertNotIn("X-RANDOM-123", body)
+
+    def test_metrics_endpoint(self):
+        self.client.get("/api/get-user-recipes/")
+        response = self.client.get("/api/metrics/")
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn("# TYPE smartbites_request_duration_seconds histogram", body)
+        self.assertIn('smartbites_db_queries_count{view="get_user_recipes"}', body)
+        self.assertEqual(self.client.get("/api/metrics/", REMOTE_ADDR="10.1.2.3").status_code, 403)
+
+
+# Benchmark tooling
+class BenchmarkToolingTests(TestCase):
+    def test_stub_ollama_serves_structured_recipes(self):
+        server = StubOllamaServer(("127.0.0.1", 0), latency=0, token_rate=0)
+        server.start()
+        try:
+            with override_settings(OLLAMA_URL=server.url):
+                recipe = generate_recipe("Create a dinner recipe")
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(recipe, STUB_RECIPE)
+
+    def test_seed_synthetic_data(self):
+        call_command("seed_synthetic_data", users=3, recipes=20, batch_size=7, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(CustomUser.objects.filter(email__startswith="bench-").count(), 3)
+        self.assertEqual(UserProfile.objects.filter(user__email__startswith="bench-").count(), 3)
+        self.assertEqual(Recipe.objects.filter(user__email__startswith="bench-").count(), 20)
+        self.assertTrue(CustomUser.objects.get(email="bench-0@example.com").check_password("benchmark-pass"))
+
+    def test_report_statistics_and_comparison(self):
+        self.assertEqual(percentile(list(range(1, 101)), 0.95), 95)
+        self.assertEqual(queries_from_server_timing('total;dur=5.0, db;dur=1.2;desc="4 queries"'), 4)
+        baseline = {"results": {"8": {"login": {"p95_ms": 100, "throughput_rps": 50, "queries_per_request": 3}}}}
+        report = {"results": {"8": {"login": {"p95_ms": 150, "throughput_rps": 49, "queries_per_request": 4}}}}
+        self.assertEqual(len(compare(report, baseline, tolerance=0.2)), 2)
+
+
+# Query-count and query-plan guard for every API route
+SMALL_SCALE, LARGE_SCALE = 3, 60
+
+# Maximum queries per request, counting the SAVEPOINT/RELEASE pairs that atomic()
+# blocks issue inside TestCase. Each route must make the same number at both scales.
+# Failed-login counters live in the database-backed 'shared' cache unless Redis is
+# configured, which costs register, login and change-password a query or two.
+QUERY_BUDGETS = {
+    "register": 4,
+    "login": 4,
+    "logout": 4,  # Deleting tokens also deletes their TokenExpiry rows
+    "authentication": 1,
+    "get_user_profile": 2,
+    "save_recipe": 3,
+    "get_user_recipes": 2,
+    "update-recipe": 3,
+    "delete_recipe": 3,
+    "delete_multiple_recipes": 2,
+    "bulk_update_recipes": 3,
+    "export_recipes": 2,
+    "import_recipes": 5,
+    "query_ollama": 2,
+    "meal_plan": 6,
+    "metrics": 3,  # Two table estimates (MySQL, PostgreSQL) and the shared cache
+    "current-user": 2,
+    "update-profile": 2,
+    "change-password": 3,
+    "update-user-profile": 3,
+}
+
+
+def full_table_scans(connection, sql, table):
+    """Return the EXPLAIN lines showing a full scan of `table`, for the backends we run on."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            plan = [row[-1] for row in cursor.fetchall()]
+            return [line for line in plan if re.match(rf"SCAN {table}\b(?! USING (COVERING )?INDEX)", line)]
+        if connection.vendor == "postgresql":
+            cursor.execute("EXPLAIN " + sql)
+            return [row[0] for row in cursor.fetchall() if f"Seq Scan on {table}" in row[0]]
+        if connection.vendor == "mysql":
+            cursor.execute("EXPLAIN FORMAT=JSON " + sql)
+            plan = json.loads(cursor.fetchone()[0])
+            scans = []
+
+            def walk(node):
+                if isinstance(node, dict):
+                    if node.get("table_name") == table and node.get("access_type") == "ALL":
+                        scans.append(json.dumps(node))
+                    for value in node.values():
+                        walk(value)
+                elif isinstance(node, list):
+                    for value in node:
+                        walk(value)
+            walk(plan)
+            return scans
+    return []
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class ApiQueryBudgetTests(TestCase):
+    def seed(self, scale):
+        """A user with `scale` recipes, plus a neighbour with as many, so growth shows up in counts."""
+        user = CustomUser.objects.create_user(email=f"owner{scale}@example.com", password="s3cret-pass")
+        neighbour = CustomUser.objects.create_user(email=f"neighbour{scale}@example.com", password="s3cret-pass")
+        for owner in (user, neighbour):
+            Recipe.objects.bulk_create([
+                Recipe(user=owner, title=f"Recipe {i}", ingredients="rice, egg", instructions="Cook.", cost=Decimal("10"))
+                for i in range(scale)
+            ])
+        return user
+
+    def new_recipe(self, user):
+        return Recipe.objects.create(user=user, title="Target", ingredients="egg", instructions="Fry.")
+
+    def prepare(self, name, user, client, scale):
+        """Arrange the data a route needs and return (method, path, data)."""
+        ids = list(Recipe.objects.filter(user=user).values_list("id", flat=True))
+        if name == "register":
+            return "post", "/api/register/", {"email": f"new{scale}@example.com", "password": "s3cret-pass"}
+        if name == "login":
+            return "post", "/api/login/", {"email": user.email, "password": "s3cret-pass"}
+        if name == "save_recipe":
+            return "post", "/api/save-recipe/", {"title": "Fresh", "ingredients": "egg", "instructions": "Boil."}
+        if name == "update-recipe":
+            return "put", f"/api/update-recipe/{ids[0]}/", {"cost": "12.00"}
+        if name == "delete_recipe":
+            return "delete", f"/api/delete-recipe/{self.new_recipe(user).id}/", None
+        if name == "delete_multiple_recipes":
+            targets = [self.new_recipe(user).id for _ in range(scale)]
+            return "post", "/api/delete-multiple-recipes/", {"recipe_ids": targets}
+        if name == "bulk_update_recipes":
+            return "patch", "/api/bulk-update-recipes/", {"recipes": [{"id": i, "cost": "11.00"} for i in ids]}
+        if name == "import_recipes":
+            lines = [{"title": f"Imported {i}", "ingredients": "egg", "instructions": "Mix."} for i in range(scale)]
+            return "import", "/api/import-recipes/", "\n".join(json.dumps(line) for line in lines).encode()
+        if name == "query_ollama":
+            return "post", "/api/query-ollama/", {"prompt": "Dinner?"}
+        if name == "meal_plan":
+            return "post", "/api/meal-plan/", {"days": 2, "save": True}
+        if name in ("update-profile", "update-user-profile"):
+            data = {"full_name": "Renamed"} if name == "update-profile" else {"allergies": "nuts"}
+            return "patch", reverse(name), data
+        if name == "change-password":
+            return "post", "/api/change-password/", {
+                "old_password": "s3cret-pass", "new_password1": "n3w-s3cret-pass", "new_password2": "n3w-s3cret-pass"}
+        return "get" if name != "logout" else "post", reverse(name), None
+
+    def run_route(self, name, user, scale):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.get_or_create(user=user)[0].key)
+        method, path, data = self.prepare(name, user, client, scale)
+
+        def fake_post(url, json=None, **kwargs):
+            if json and json.get("format") == "json":
+                return FakeOllamaStream('{"title": "Plan %s", "ingredients": "rice", "instructions": "Cook.", "cost": 20}'
+                                        % json["prompt"].split("for day ")[1].split(" ")[0])
+            return FakeOllamaStream("Try adobo")
+
+        with mock.patch("requests.post", side_effect=fake_post), CaptureQueriesContext(connection) as queries:
+            if method == "import":
+                response = client.post(path, data=data, content_type="application/x-ndjson")
+            else:
+                response = getattr(client, method)(path, data, format="json")
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertLess(response.status_code, 400, f"{name}: {getattr(response, 'data', response.status_code)}")
+        return [query["sql"] for query in queries.captured_queries]
+
+    def test_every_route_has_a_fixed_query_budget_and_no_full_scans(self):
+        names = [pattern.name for pattern in urlpatterns]
+        self.assertEqual(sorted(set(names) - set(QUERY_BUDGETS)), [], "Add a query budget for new routes")
+
+        counts = {}
+        for scale in (SMALL_SCALE, LARGE_SCALE):
+            user = self.seed(scale)
+            # Logout and password changes invalidate the client, so they run last
+            for name in sorted(names, key=lambda name: name in ("logout", "change-password")):
+                sqls = self.run_route(name, user, scale)
+                counts.setdefault(name, []).append(len(sqls))
+                for sql in sqls:
+                    if re.match(r"\s*(SELECT|UPDATE|DELETE)\b", sql) and "api_recipe" in sql:
+                        scans = full_table_scans(connection, sql, "api_recipe")
+                        self.assertEqual(scans, [], f"{name} scans api_recipe:\n{sql}")
+
+        for name, (small, large) in counts.items():
+            with self.subTest(route=name):
+                self.assertEqual(small, large, f"{name} grows with data: {small} -> {large} queries")
+                self.assertLessEqual(large, QUERY_BUDGETS[name], f"{name} made {large} queries")
+
+
+# Password hashing pool and throttling
+@override_settings(
+    PASSWORD_HASHERS=["api.hashers.TunablePBKDF2PasswordHasher"],
+    PASSWORD_PBKDF2_ITERATIONS=1000,
+    AUTH_FAILURES_PER_EMAIL=3,
+)
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email="hash@example.com", password="s3cret-pass")
+        self.client = APIClient()
+
+    def login(self, password):
+        return self.client.post("/api/login/", {"email": "hash@example.com", "password": password}, format="json")
+
+    def test_failed_logins_are_throttled_before_hashing(self):
+        for _ in range(3):
+            self.assertEqual(self.login("wrong").status_code, 400)
+        with mock.patch("api.passwords.run") as run:
+            response = self.login("s3cret-pass")
+        self.assertEqual(response.status_code, 429)
+        run.assert_not_called()
+
+    def test_non_string_credentials_are_rejected(self):
+        for email in (1, ["hash@example.com"], {"address": "hash@example.com"}):
+            with self.subTest(email=email):
+                response = self.client.post("/api/login/", {"email": email, "password": "s3cret-pass"}, format="json")
+                self.assertEqual(response.status_code, 400)
+                response = self.client.post("/api/register/", {"email": email, "password": "s3cret-pass"}, format="json")
+                self.assertEqual(response.status_code, 400)
+        response = self.client.post("/api/login/", {"email": "hash@example.com", "password": 123456}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_login_rehashes_with_the_configured_cost(self):
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$1000$"))
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertEqual(self.login("s3cret-pass").status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$2000$"))
+        self.assertEqual(self.login("s3cret-pass").status_code, 200)
+
+    def test_register_hashes_on_the_pool(self):
+        response = self.client.post("/api/register/", {"email": "new@example.com", "password": "s3cret-pass"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        user = CustomUser.objects.get(email="new@example.com")
+        self.assertTrue(user.check_password("s3cret-pass"))
+        self.assertTrue(UserProfile.objects.filter(user=user).exists())
+
+    def test_failure_counters_are_shared_and_incremented_atomically(self):
+        self.login("wrong")
+        key = _keys("hash@example.com", None)["email"]
+        # Without Redis the counters are rows every worker reads, not per-process cache entries
+        self.assertEqual(AuthFailureCounter.objects.get(key=key).count, 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.login("wrong")
+        self.assertEqual(AuthFailureCounter.objects.get(key=key).count, 2)
+        # A single UPDATE ... SET count = count + 1, so concurrent failures are never lost
+        updates = [query["sql"] for query in queries.captured_queries if query["sql"].startswith("UPDATE")]
+        self.assertTrue(any('"count" = ("api_authfailurecounter"."count" + 1)' in sql for sql in updates), updates)
+
+    def test_full_pool_answers_503(self):
+        with mock.patch("api.passwords.run", side_effect=HashingUnavailable):
+            response = self.login("s3cret-pass")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+
+
+# Token lifecycle
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class TokenLifecycleTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email="token@example.com", password="s3cret-pass")
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+    def age_token(self, delta):
+        TokenExpiry.objects.filter(token=self.token).update(refreshed_at=timezone.now() - delta)
+
+    def test_expired_token_is_rejected_and_deleted(self):
+        self.age_token(settings.TOKEN_TTL + timedelta(minutes=1))
+        self.assertEqual(self.client.get("/api/authentication/").status_code, 401)
+        self.assertFalse(Token.objects.filter(pk=self.token.pk).exists())
+
+    def test_use_slides_expiry_at_most_once_per_interval(self):
+        self.age_token(settings.TOKEN_TTL - timedelta(minutes=1))
+        self.assertEqual(self.client.get("/api/authentication/").status_code, 200)
+        refreshed = TokenExpiry.objects.get(token=self.token).refreshed_at
+        self.assertGreater(refreshed, timezone.now() - timedelta(minutes=1))
+        # Token.created keeps the issue time
+        self.assertEqual(Token.objects.get(pk=self.token.pk).created, self.token.created)
+        with self.assertNumQueries(1):
+            self.client.get("/api/authentication/")
+
+    def test_login_replaces_an_expired_token(self):
+        self.age_token(settings.TOKEN_TTL + timedelta(days=1))
+        response = self.client.post("/api/login/", {"email": "token@example.com", "password": "s3cret-pass"}, format="json")
+        self.assertNotEqual(response.data["token"], self.token.key)
+        self.assertFalse(is_expired(Token.objects.get(user=self.user)))
+
+    def test_purge_deletes_expired_rows_in_batches(self):
+        self.age_token(settings.TOKEN_TTL + timedelta(days=1))
+        fresh = CustomUser.objects.create_user(email="fresh@example.com", password="s3cret-pass")
+        Token.objects.create(user=fresh)
+        Session.objects.bulk_create([
+            Session(session_key=f"expired{i}", session_data="", expire_date=timezone.now() - timedelta(days=1))
+            for i in range(5)
+        ] + [Session(session_key="live", session_data="", expire_date=timezone.now() + timedelta(days=1))])
+
+        out = io.StringIO()
+        call_command("purge_expired_auth", batch_size=2, pause=0, stdout=out)
+        stats = json.loads(out.getvalue())
+        self.assertEqual((stats["tokens_deleted"], stats["sessions_deleted"]), (1, 5))
+        self.assertEqual((stats["token_rows"], stats["session_rows"]), (1, 1))
+        # The command usually runs in its own process: the web workers read its stats from the shared cache
+        self.assertEqual(caches.create_connection("shared").get(PURGE_STATS_KEY)["tokens_deleted"], 1)
+        with mock.patch("api.authentication.estimated_row_count", side_effect=[1, 1]):
+            body = self.client.get("/api/metrics/").content.decode()
+        self.assertIn("smartbites_auth_purge_deleted_rows 6", body)
+        self.assertIn("smartbites_auth_token_rows 1", body)
+        self.assertIn("smartbites_auth_session_rows 1", body)
+
+
+# Admin changelists
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser(email="admin@example.com", password="s3cret-pass")
+        self.client.force_login(self.admin)
+
+    def seed(self, count, offset):
+        users = [
+            CustomUser.objects.create_user(email=f"cook{offset + i}@example.com", password=None)
+            for i in range(count)
+        ]
+        Recipe.objects.bulk_create([
+            Recipe(user=user, title=f"Recipe {offset + i}", ingredients="rice", instructions="Cook.")
+            for i, user in enumerate(users)
+        ])
+
+    def changelist_queries(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        paths = ["/admin/api/recipe/", "/admin/api/userprofile/", "/admin/api/customuser/",
+                 "/admin/api/recipe/?q=Recipe"]
+        self.seed(3, 0)
+        small = [self.changelist_queries(path) for path in paths]
+        self.seed(40, 100)
+        large = [self.changelist_queries(path) for path in paths]
+        self.assertEqual(small, large)
+
+    def test_unfiltered_count_uses_table_estimate(self):
+        self.seed(2, 0)
+        with mock.patch("api.admin.estimated_row_count", return_value=5_000_000) as estimate:
+            response = self.client.get("/admin/api/recipe/")
+            self.assertEqual(response.context["cl"].result_count, 5_000_000)
+            response = self.client.get("/admin/api/recipe/?q=Recipe")
+            self.assertEqual(response.context["cl"].result_count, 2)
+        self.assertEqual(estimate.call_count, 1)
+
+
+# Compression and compact renderer
+class ResponseEncodingTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email="wire@example.com", password="s3cret-pass")
+        Recipe.objects.bulk_create([
+            Recipe(user=self.user, title=f"Recipe {i}", ingredients="rice, egg",
+                   instructions="Rinse the rice. Cook it slowly. " * 10, cost=Decimal("25.50"))
+            for i in range(20)
+        ])
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+
+    def test_negotiates_the_best_accepted_coding(self):
+        self.assertEqual(negotiate_encoding("gzip, deflate"), "gzip")
+        self.assertIsNone(negotiate_encoding("gzip;q=0, identity"))
+        self.assertIsNone(negotiate_encoding(""))
+        self.assertEqual(negotiate_encoding("br, gzip"), "br" if brotli else "gzip")
+        self.assertEqual(negotiate_encoding("br;q=0.5, gzip;q=0.8"), "gzip")
+
+    def test_large_responses_are_gzipped_and_small_ones_are_not(self):
+        plain = self.client.get("/api/get-user-recipes/")
+        compressed = self.client.get("/api/get-user-recipes/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(compressed["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", compressed["Vary"])
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertLess(len(compressed.content), len(plain.content) // 4)
+
+        small = self.client.get("/api/authentication/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(small.has_header("Content-Encoding"))
+
+    def test_html_pages_are_not_compressed(self):
+        # Pages carrying a CSRF token stay uncompressed (BREACH)
+        for path, accept in (("/admin/login/", "text/html"), ("/api/get-user-recipes/", "text/html")):
+            response = self.client.get(path, HTTP_ACCEPT=accept, HTTP_ACCEPT_ENCODING="gzip")
+            self.assertEqual(response.status_code, 200)
+            self.assertGreater(len(response.content), settings.COMPRESSION_MIN_SIZE)
+            self.assertFalse(response.has_header("Content-Encoding"), path)
+
+    def test_streamed_reply_is_flushed_chunk_by_chunk(self):
+        with mock.patch("requests.post", return_value=FakeOllamaStream("Try chicken adobo tonight")):
+            response = self.client.post("/api/query-ollama/", {"prompt": "Dinner?", "stream": True},
+                                        format="json", HTTP_ACCEPT_ENCODING="gzip")
+            self.assertEqual(response["Content-Encoding"], "gzip")
+            decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            # Every chunk decodes to whole lines without waiting for the rest of the stream
+            lines = [decoder.decompress(chunk) for chunk in response.streaming_content]
+        pieces = [json.loads(line) for line in lines if line]
+        self.assertEqual("".join(piece.get("response", "") for piece in pieces).strip(), "Try chicken adobo tonight")
+        self.assertEqual(pieces[-1], {"done": True})
+
+    def test_compact_renderer_sends_recipe_lists_as_columns(self):
+        full = self.client.get("/api/get-user-recipes/").json()
+        compact = self.client.get("/api/get-user-recipes/", HTTP_ACCEPT="application/vnd.smartbites.compact+json")
+        self.assertEqual(compact["Content-Type"], "application/vnd.smartbites.compact+json")
+        data = json.loads(compact.content)
+        self.assertEqual([dict(zip(data["fields"], row)) for row in data["rows"]], full)
+
+        # Objects are sent as is, only minified
+        profile = self.client.get("/api/current-user/", HTTP_ACCEPT="application/vnd.smartbites.compact+json")
+        self.assertEqual(json.loads(profile.content)["email"], "wire@example.com")
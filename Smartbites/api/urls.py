@@ -6,8 +6,12 @@ from .views import register_user, login_user, logout_user, my_secure_view
 from .views import get_user_profile
 # Save, Fetch, Delete, Edit Recipe
 from .views import save_recipe, get_user_recipes, delete_recipe, delete_multiple_recipes, update_recipe
+# Bulk import / export
+from .views import export_recipes, import_recipes, bulk_update_recipes
 # ollama
-from .views import query_ollama
+from .views import query_ollama, meal_plan
+# metrics
+from .views import metrics
 # display user data in react
 from .views import get_current_user
 # edit account, change password
@@ -26,7 +30,12 @@ urlpatterns = [
     path('update-recipe/<int:recipe_id>/', update_recipe, name='update-recipe'),
     path('delete-recipe/<int:recipe_id>/', delete_recipe, name='delete_recipe'),
     path('delete-multiple-recipes/', delete_multiple_recipes, name='delete_multiple_recipes'),
+    path('bulk-update-recipes/', bulk_update_recipes, name='bulk_update_recipes'),
+    path('export-recipes/', export_recipes, name='export_recipes'),
+    path('import-recipes/', import_recipes, name='import_recipes'),
     path('query-ollama/', query_ollama, name='query_ollama'),
+    path('meal-plan/', meal_plan, name='meal_plan'),
+    path('metrics/', metrics, name='metrics'),
     path('current-user/', get_current_user, name='current-user'),
     path('update-profile/', update_profile, name='update-profile'),
     path('change-password/', change_password, name='change-password'),
@@ -8,12 +8,25 @@ from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from .models import UserProfile
 from .models import CustomUser
+from django.conf import settings
 from django.contrib.auth import logout
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
-from rest_framework.authentication import TokenAuthentication
+from .authentication import ExpiringTokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from . import passwords
+
+# Password hashing runs on a bounded pool; these are its two refusal responses
+def _throttled_response():
+    return Response({"error": "Too many failed attempts. Try again later."},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS,
+                    headers={"Retry-After": str(settings.AUTH_FAILURE_WINDOW)})
+
+def _hashing_busy_response():
+    return Response({"error": "The server is busy. Try again shortly."},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "1"})
 
 @api_view(['POST'])
+@authentication_classes([])  # Anonymous endpoint: a stale or expired token must not block it
 def register_user(request):
     email = request.data.get("email")
     full_name = request.data.get("full_name")  # Get full name from request
@@ -21,36 +34,65 @@ def register_user(request):
 
     if not email or not password:
         return Response({"error": "Email and password are required."}, status=status.HTTP_400_BAD_REQUEST)
+    if not isinstance(email, str) or not isinstance(password, str) or not isinstance(full_name, (str, type(None))):
+        return Response({"error": "Email, password and full name must be strings."}, status=status.HTTP_400_BAD_REQUEST)
+
+    if passwords.is_throttled(ip=passwords.client_ip(request)):
+        return _throttled_response()
 
     if CustomUser.objects.filter(email=email).exists():
         return Response({"error": "User with this email already exists."}, status=status.HTTP_400_BAD_REQUEST)
 
-    user = CustomUser.objects.create_user(email=email, password=password, full_name=full_name)  # Pass full_name
+    try:
+        password_hash = passwords.make_password(password)  # Hash on the pool, not the request thread
+    except passwords.HashingUnavailable:
+        return _hashing_busy_response()
+    user = CustomUser.objects.create_user_with_password_hash(email=email, password_hash=password_hash, full_name=full_name)  # Pass full_name
     return Response({"message": "User registered successfully"}, status=status.HTTP_201_CREATED)
 
 # User Login
-from django.contrib.auth import authenticate
 from rest_framework.authtoken.models import Token
+from .authentication import is_expired
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 
 @api_view(['POST'])
+@authentication_classes([])  # Anonymous endpoint: a stale or expired token must not block it
 def login_user(request):
     """API to log in a user and return an authentication token"""
     email = request.data.get('email')  # Change from 'username' to 'email'
     password = request.data.get('password')
-    
-    user = authenticate(email=email, password=password)  # Ensure this matches your user model
-    if user:
-        token, _ = Token.objects.get_or_create(user=user)
+    ip = passwords.client_ip(request)
+
+    if not isinstance(email, (str, type(None))) or not isinstance(password, (str, type(None))):
+        return Response({'error': 'Email and password must be strings.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Reject throttled clients before spending any time on hashing
+    if passwords.is_throttled(email=email, ip=ip):
+        return _throttled_response()
+
+    user = CustomUser.objects.filter(email=email).first() if email else None
+    try:
+        valid = passwords.verify(user, password)  # Also re-hashes outdated hashes
+    except passwords.HashingUnavailable:
+        return _hashing_busy_response()
+
+    if valid and user.is_active:
+        passwords.clear_failures(email)
+        token, created = Token.objects.select_related('expiry').get_or_create(user=user)
+        if not created and is_expired(token):
+            # Issue a fresh token rather than handing back one that no longer authenticates
+            token.delete()
+            token = Token.objects.create(user=user)
         return Response({'token': token.key}, status=status.HTTP_200_OK)
-    
+
+    passwords.record_failure(email=email, ip=ip)
     return Response({'error': 'Invalid credentials'}, status=status.HTTP_400_BAD_REQUEST)
 
 # User Logout
 @api_view(['POST'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def logout_user(request):
     """API to log out a user"""
@@ -66,11 +108,11 @@ def logout_user(request):
 # User Authentication
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
-from rest_framework.authentication import TokenAuthentication
+from .authentication import ExpiringTokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
 @api_view(["GET"])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def my_secure_view(request):
     return Response({"message": "Welcome, authorized user!"})
@@ -80,11 +122,22 @@ from .serializers import UserProfileSerializer
 from .models import UserProfile
 from rest_framework.permissions import IsAuthenticated
 
+from .routers import PRIMARY
+
+def _user_profile(user, queryset):
+    """The user's profile, read again from the primary if a lagging replica does not have it yet."""
+    try:
+        return queryset.get(user=user)
+    except UserProfile.DoesNotExist:
+        return queryset.using(PRIMARY).filter(user=user).first()
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])  # Ensure the user is logged in
 def get_user_profile(request):
     """API to get the logged-in user's profile"""
-    user_profile = UserProfile.objects.get(user=request.user)  # Get profile linked to user
+    user_profile = _user_profile(request.user, UserProfile.objects.select_related('user'))  # Get profile linked to user
+    if user_profile is None:
+        return Response({"error": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
     serializer = UserProfileSerializer(user_profile)  # Serialize it
     return Response(serializer.data)  # Send JSON response
 
@@ -92,13 +145,16 @@ def get_user_profile(request):
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
-from rest_framework.authentication import TokenAuthentication
+from .authentication import ExpiringTokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from django.http import HttpResponse
 from .models import Recipe
-from .serializers import RecipeSerializer
+from .serializers import RecipeSerializer, recipe_list_encoder
+from rest_framework.exceptions import ValidationError
+from . import bulk
 
 @api_view(['POST'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def save_recipe(request):
     """Save a recipe with duplicate checking"""
@@ -123,16 +179,24 @@ def save_recipe(request):
     return Response({'status': 'error', 'errors': serializer.errors}, status=400)
 
 @api_view(['GET'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def get_user_recipes(request):
     """Retrieve all recipes saved by the logged-in user."""
     recipes = Recipe.objects.filter(user=request.user)
+    renderer = request.accepted_renderer
+    if renderer.format == 'json' and renderer.get_indent(request.accepted_media_type, {}) is None:
+        # Fast path: render value tuples straight to the bytes RecipeSerializer would produce
+        rows = recipes.values_list(*recipe_list_encoder.fields)
+        return HttpResponse(recipe_list_encoder.render(rows), content_type=renderer.media_type)
+    if renderer.format == 'compact':
+        rows = recipes.values_list(*recipe_list_encoder.fields)
+        return HttpResponse(recipe_list_encoder.render_compact(rows), content_type=renderer.media_type)
     serializer = RecipeSerializer(recipes, many=True)
     return Response(serializer.data)
 
 @api_view(['PUT'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def update_recipe(request, recipe_id):
     try:
@@ -147,7 +211,7 @@ def update_recipe(request, recipe_id):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['DELETE'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def delete_recipe(request, recipe_id):
     """Delete a recipe saved by the logged-in user."""
@@ -159,25 +223,18 @@ def delete_recipe(request, recipe_id):
         return Response({'error': 'Recipe not found'}, status=status.HTTP_404_NOT_FOUND)
     
 @api_view(['POST'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def delete_multiple_recipes(request):
     """Delete multiple recipes with validation"""
     try:
         recipe_ids = request.data.get('recipe_ids', [])
-        
-        # Verify ownership and existence
-        recipes = Recipe.objects.filter(
-            id__in=recipe_ids,
-            user=request.user
-        )
-        
-        # Get IDs that actually exist and belong to user
-        valid_ids = list(recipes.values_list('id', flat=True))
-        deleted_count = recipes.delete()[0]
-        
+
+        # One ownership-scoped DELETE that reports the ids it removed
+        valid_ids = bulk.delete_recipes(request.user, recipe_ids)
+
         return Response({
-            'deleted_count': deleted_count,
+            'deleted_count': len(valid_ids),
             'valid_ids': valid_ids
         }, status=status.HTTP_200_OK)
         
@@ -187,55 +244,142 @@ def delete_multiple_recipes(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+@api_view(['PATCH'])
+@authentication_classes([ExpiringTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def bulk_update_recipes(request):
+    """Apply partial updates to many recipes: {"recipes": [{"id": 1, "cost": "99.00"}, ...]}"""
+    items = request.data.get('recipes')
+    if not isinstance(items, list) or not items:
+        return Response({'error': 'recipes must be a non-empty list.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > bulk.BULK_UPDATE_MAX:
+        return Response({'error': f'At most {bulk.BULK_UPDATE_MAX} recipes can be updated at once.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    # Validate everything up front so the batch is applied all-or-nothing
+    serializer = RecipeSerializer(partial=True)
+    updates, errors = {}, {}
+    for index, item in enumerate(items):
+        recipe_id = item.get('id') if isinstance(item, dict) else None
+        if not isinstance(recipe_id, int) or isinstance(recipe_id, bool):
+            errors[index] = {'id': ['A valid recipe id is required.']}
+            continue
+        if recipe_id in updates:
+            errors[index] = {'id': ['Duplicate recipe id.']}
+            continue
+        try:
+            updates[recipe_id] = serializer.run_validation(item)
+        except ValidationError as e:
+            errors[index] = e.detail
+    if errors:
+        return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    recipes, missing_ids = bulk.update_recipes(request.user, updates)
+    return Response({
+        'updated_count': len(recipes),
+        'recipes': RecipeSerializer(recipes, many=True).data,
+        'missing_ids': missing_ids,
+    }, status=status.HTTP_200_OK)
+
+# Bulk import / export
+from django.http import StreamingHttpResponse
+
+@api_view(['GET'])
+@authentication_classes([ExpiringTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def export_recipes(request):
+    """Stream the logged-in user's recipes as NDJSON."""
+    response = StreamingHttpResponse(bulk.export_chunks(request.user), content_type='application/x-ndjson')
+    response['Content-Disposition'] = 'attachment; filename="recipes.ndjson"'
+    return response
+
+@api_view(['POST'])
+@authentication_classes([ExpiringTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def import_recipes(request):
+    """Import NDJSON recipes from the request body, one recipe per line."""
+    stream = request.stream
+    if stream is None:
+        return Response({'error': 'Request body is empty.'}, status=status.HTTP_400_BAD_REQUEST)
+    report = bulk.import_recipes(request.user, stream)
+    return Response(report, status=status.HTTP_200_OK)
+
 # ollama - biteai
+from django.conf import settings
 from .models import UserProfile
-import requests, json, base64
+from . import instrumentation, ollama
+import requests, json, base64, time
 
 @api_view(['POST'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def query_ollama(request):
     """
     Retrieves the current user's profile details and combines them with the query.
     Sends the combined prompt to Ollama and returns the model's response.
+    With "stream": true the reply is sent as NDJSON lines while it is generated.
     """
     try:
         user_prompt = request.data.get("prompt", "Hello, Ollama!")
         image_file = request.FILES.get("image", None)
 
-        try:
-            profile = UserProfile.objects.get(user=request.user)
-        except UserProfile.DoesNotExist:
-            profile = None
-
-        profile_info_parts = []
-        if profile:
-            if profile.dietary_preference:
-                profile_info_parts.append(f"Diet: {profile.dietary_preference}")
-            if profile.allergies:
-                profile_info_parts.append(f"Allergies: {profile.allergies}")
-            if profile.budget is not None:
-                profile_info_parts.append(f"Monthly Budget: ₱{profile.budget}")
-        profile_info = ". ".join(profile_info_parts)
-
-        full_prompt = f"{profile_info}. {user_prompt}" if profile_info else user_prompt
-
-        if image_file:
-            image_content = image_file.read()
-            encoded_image = base64.b64encode(image_content).decode("utf-8")
-        else:
-            encoded_image = None
+        with instrumentation.phase("prompt_build"):
+            try:
+                profile = UserProfile.objects.get(user=request.user)
+            except UserProfile.DoesNotExist:
+                profile = None
+
+            profile_info = ollama.profile_summary(profile)
+
+            full_prompt = f"{profile_info}. {user_prompt}" if profile_info else user_prompt
+
+        with instrumentation.phase("image_encode"):
+            if image_file:
+                image_content = image_file.read()
+                encoded_image = base64.b64encode(image_content).decode("utf-8")
+            else:
+                encoded_image = None
 
         ollama_payload = {
-            "model": "biteai",
+            "model": settings.OLLAMA_MODEL,
             "prompt": full_prompt,
         }
         if encoded_image:
             ollama_payload["images"] = [encoded_image]
 
-        response = requests.post("http://127.0.0.1:11434/api/generate", json=ollama_payload)
-        response_jsons = [json.loads(line) for line in response.text.split("\n") if line.strip()]
-        final_response = "".join(entry["response"] for entry in response_jsons)
+        if str(request.data.get("stream", "")).lower() in ("1", "true"):
+            # Relay the reply as NDJSON lines while it is generated; every line is flushed on its own
+            started = time.perf_counter()
+            try:
+                upstream = ollama.open_stream(ollama_payload)
+            except requests.RequestException as e:
+                return Response({"error": str(e)}, status=status.HTTP_502_BAD_GATEWAY)
+
+            def lines():
+                try:
+                    for piece in ollama.stream_text(upstream, started):
+                        yield json.dumps({"response": piece}) + "\n"
+                except (requests.RequestException, ValueError) as e:
+                    yield json.dumps({"error": str(e)}) + "\n"
+                    return
+                yield json.dumps({"done": True}) + "\n"
+            return StreamingHttpResponse(lines(), content_type="application/x-ndjson")
+
+        # Stream the reply so time-to-first-token and generation time can be told apart
+        started = time.perf_counter()
+        lines, first_token = [], None
+        with requests.post(settings.OLLAMA_URL, json=ollama_payload, stream=True,
+                           timeout=settings.OLLAMA_TIMEOUT) as response:
+            for line in response.iter_lines():
+                if first_token is None:
+                    first_token = time.perf_counter()
+                    instrumentation.record_phase("ttft", first_token - started)
+                lines.append(line)
+        instrumentation.record_phase("generation", time.perf_counter() - (first_token or started))
+
+        with instrumentation.phase("parse"):
+            response_jsons = [json.loads(line) for line in lines if line.strip()]
+            final_response = "".join(entry["response"] for entry in response_jsons)
 
         cleaned_response = final_response.replace('\n\n', '\n').strip()
 
@@ -244,15 +388,77 @@ def query_ollama(request):
     except Exception as e:
         return Response({"error": str(e)}, status=500)
     
+# Meal plans
+@api_view(['POST'])
+@authentication_classes([ExpiringTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def meal_plan(request):
+    """
+    Generate a multi-day meal plan with BiteAI, one recipe per day, checked
+    against the user's allergies and budget. Recipes are generated in parallel;
+    with "stream": true each day is sent as an NDJSON line as soon as it is ready.
+    With "save": true the accepted recipes are saved in one transaction.
+    """
+    try:
+        days = int(request.data.get('days', 7))
+    except (TypeError, ValueError):
+        return Response({'error': 'days must be a number.'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= days <= settings.MEAL_PLAN_MAX_DAYS:
+        return Response({'error': f'days must be between 1 and {settings.MEAL_PLAN_MAX_DAYS}.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    meal = request.data.get('meal', 'dinner')
+    if meal not in ollama.MEALS:
+        return Response({'error': f'meal must be one of {", ".join(ollama.MEALS)}.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    prompt = request.data.get('prompt', '')
+    if not isinstance(prompt, str):
+        return Response({'error': 'prompt must be a string.'}, status=status.HTTP_400_BAD_REQUEST)
+    save = str(request.data.get('save', '')).lower() in ('1', 'true')
+    user = request.user
+    profile = UserProfile.objects.filter(user=user).first()
+    entries = ollama.generate_meal_plan(profile, days, meal, prompt)
+
+    def finish(plan):
+        summary = ollama.plan_summary(profile, days, plan)
+        if save:
+            summary['saved_count'] = bulk.save_recipes(user, [entry['fields'] for entry in plan if entry['status'] == 'ok'])
+        return summary
+
+    if str(request.data.get('stream', '')).lower() in ('1', 'true'):
+        def lines():
+            plan = []
+            for entry in entries:
+                plan.append(entry)
+                yield json.dumps(ollama.entry_data(entry)) + '\n'
+            yield json.dumps({'summary': finish(plan)}) + '\n'
+        return StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+
+    plan = sorted(entries, key=lambda entry: entry['day'])
+    return Response({
+        'plan': [ollama.entry_data(entry) for entry in plan],
+        'summary': finish(plan),
+    }, status=status.HTTP_200_OK)
+
+# Metrics
+from django.http import HttpResponseForbidden
+from .authentication import render_auth_metrics
+
+def metrics(request):
+    """Prometheus scrape endpoint for this process' request, query and phase histograms."""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    body = instrumentation.render_metrics() + render_auth_metrics()
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # Get user data
 from .models import UserProfile
 
 @api_view(['GET'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def get_current_user(request):
-    try:
-        profile = UserProfile.objects.get(user=request.user)
+    profile = _user_profile(request.user, UserProfile.objects.all())
+    if profile is not None:
         return Response({
             "full_name": request.user.full_name,
             "email": request.user.email,
@@ -261,15 +467,14 @@ def get_current_user(request):
             "allergies": profile.allergies,
             "budget": profile.budget,
         })
-    except UserProfile.DoesNotExist:
-        return Response({"error": "Profile not found"}, status=404)
+    return Response({"error": "Profile not found"}, status=404)
 
 
 # Profile Edit
 from .serializers import UserSerializer
 
 @api_view(['PATCH'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def update_profile(request):
     user = request.user
@@ -285,22 +490,31 @@ from .serializers import PasswordChangeSerializer
 from django.contrib.auth import update_session_auth_hash
 
 @api_view(['POST'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def change_password(request):
     user = request.user
     serializer = PasswordChangeSerializer(data=request.data)
     
     if serializer.is_valid():
-        # Verify old password first
-        if not user.check_password(serializer.validated_data['old_password']):
-            return Response({"old_password": ["Wrong current password"]}, status=400)
-            
-        user.set_password(serializer.validated_data['new_password1'])
-        user.save()
+        ip = passwords.client_ip(request)
+        if passwords.is_throttled(email=user.email, ip=ip):
+            return _throttled_response()
+
+        try:
+            # Verify old password first
+            if not passwords.verify(user, serializer.validated_data['old_password']):
+                passwords.record_failure(email=user.email, ip=ip)
+                return Response({"old_password": ["Wrong current password"]}, status=400)
+
+            user.password = passwords.make_password(serializer.validated_data['new_password1'])
+        except passwords.HashingUnavailable:
+            return _hashing_busy_response()
+        user.save(update_fields=['password'])
         
-        # Keep user logged in after password change
-        update_session_auth_hash(request, user)
+        # Keep user logged in after password change (token clients have no session to update)
+        if request.session.session_key:
+            update_session_auth_hash(request, user)
         
         return Response({'detail': 'Password updated successfully'})
     return Response(serializer.errors, status=400)
@@ -309,11 +523,11 @@ def change_password(request):
 from .models import UserProfile
 
 @api_view(['PATCH'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([ExpiringTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def update_user_profile(request):
     try:
-        profile = UserProfile.objects.get(user=request.user)
+        profile = UserProfile.objects.select_related('user').get(user=request.user)
     except UserProfile.DoesNotExist:
         return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -34,6 +34,63 @@ interface Message {
   image?: string;
 }
 
+const cleanAIText = (text: string) => text.replace(/\n\n/g, "\n").trimStart();
+
+// Posts the prompt with "stream" set and reports the reply text as the
+// NDJSON lines arrive (fetch in React Native cannot read a body as a stream).
+const streamAIResponse = (
+  formData: FormData,
+  token: string,
+  onText: (text: string) => void
+) =>
+  new Promise<string>((resolve, reject) => {
+    const xhr = new XMLHttpRequest();
+    let parsed = 0;
+    let text = "";
+
+    const readLines = () => {
+      const body = xhr.responseText;
+      let end;
+      while ((end = body.indexOf("\n", parsed)) !== -1) {
+        const line = body.slice(parsed, end).trim();
+        parsed = end + 1;
+        if (!line) continue;
+        const chunk = JSON.parse(line);
+        if (chunk.error) throw new Error(chunk.error);
+        if (chunk.response) {
+          text += chunk.response;
+          onText(cleanAIText(text));
+        }
+      }
+    };
+
+    xhr.open("POST", "http://192.168.100.10:8000/api/query-ollama/");
+    xhr.setRequestHeader("Authorization", `Token ${token}`);
+    xhr.onprogress = () => {
+      try {
+        readLines();
+      } catch (error) {
+        xhr.abort();
+        reject(error);
+      }
+    };
+    xhr.onload = () => {
+      if (xhr.status >= 400) {
+        reject(new Error("Failed to get response from AI"));
+        return;
+      }
+      try {
+        readLines();
+        resolve(cleanAIText(text).trim());
+      } catch (error) {
+        reject(error);
+      }
+    };
+    xhr.onerror = () => reject(new Error("Network request failed"));
+    formData.append("stream", "true");
+    xhr.send(formData);
+  });
+
 const ThinkingDots = () => {
   const dot1 = useRef(new Animated.Value(0.3)).current;
   const dot2 = useRef(new Animated.Value(0.3)).current;
@@ -476,40 +533,52 @@ const ChatScreen = () => {
           return false;
         }
         
-        const response = await fetch(
-          "http://192.168.100.10:8000/api/query-ollama/",
-          {
-            method: "POST",
-            headers: {
-              "Content-Type": "multipart/form-data",
-              Authorization: `Token ${token}`,
-            },
-            body: formData,
+        // Start typing out the reply as soon as its first words arrive
+        let started = false;
+        const showText = (text: string) => {
+          // The chat was cleared while the reply was arriving
+          if (globalResponseState.thinkingMessageId !== thinkingMessage.id) return;
+          globalResponseState.fullResponse = text;
+          if (!started) {
+            started = true;
+            globalResponseState.currentIndex = 0;
+            setMessages((prev) =>
+              prev.map((msg) =>
+                msg.id === thinkingMessage.id ? { ...msg, text: "" } : msg
+              )
+            );
           }
-        );
-  
-        if (!response.ok) throw new Error("Failed to get response from AI");
-  
-        const data = await response.json();
-        const fullResponse = data.response;
-  
-        globalResponseState.fullResponse = fullResponse;
-        globalResponseState.currentIndex = 0;
-  
-        setMessages((prev) =>
-          prev.map((msg) =>
-            msg.id === thinkingMessage.id ? { ...msg, text: "" } : msg
-          )
-        );
-  
-        globalResponseState.startResponseAnimation(globalResponseState.currentIndex);
-        
+          if (
+            !globalResponseState.responseInterval &&
+            globalResponseState.currentIndex < text.length
+          ) {
+            globalResponseState.startResponseAnimation(globalResponseState.currentIndex);
+          }
+        };
+
+        // Keeps isResponding set (and sending disabled) until the whole reply is in
+        globalResponseState.streamOpen = true;
+        let fullResponse: string;
+        try {
+          fullResponse = await streamAIResponse(formData, token, showText);
+        } finally {
+          globalResponseState.streamOpen = false;
+        }
+        if (globalResponseState.thinkingMessageId !== thinkingMessage.id) return;
+
         const completionListener = globalResponseState.messageUpdated.subscribe(() => {
           if (!globalResponseState.isResponding) {
             setIsAIResponding(false);
             completionListener.unsubscribe();
           }
         });
+
+        // Hand off to the animation, which now stops at the end of the text
+        showText(fullResponse);
+        if (!globalResponseState.responseInterval) {
+          // Typed out in full while streaming; publish the final text
+          globalResponseState.isResponding = false;
+        }
         
       } catch (error) {
         console.error("Error fetching AI response:", error);
@@ -8,6 +8,7 @@ class ResponseState {
   private _currentIndex: number = 0;
   private _thinkingMessageId: number | null = null;
   private _isResponding: boolean = false;
+  private _streamOpen: boolean = false;
   public readonly messageUpdated = new Subject<MessageUpdate>();
 
   get responseInterval(): NodeJS.Timeout | null {
@@ -38,6 +39,16 @@ class ResponseState {
     this._thinkingMessageId = value;
   }
 
+  // True while the reply is still arriving: catching up with it pauses the
+  // animation instead of ending the response.
+  get streamOpen(): boolean {
+    return this._streamOpen;
+  }
+
+  set streamOpen(value: boolean) {
+    this._streamOpen = value;
+  }
+
   get isResponding(): boolean {
     return this._isResponding;
   }
@@ -68,6 +79,8 @@ class ResponseState {
           id: this._thinkingMessageId!,
           text: currentText
         });
+      } else if (this._streamOpen) {
+        this.pauseResponseAnimation();
       } else {
         this.stopResponseAnimation();
         this.messageUpdated.next({
@@ -78,16 +91,21 @@ class ResponseState {
     }, 30);
   }
 
-  stopResponseAnimation(): void {
+  pauseResponseAnimation(): void {
     if (this._responseInterval) {
       clearInterval(this._responseInterval);
       this._responseInterval = null;
     }
+  }
+
+  stopResponseAnimation(): void {
+    this.pauseResponseAnimation();
     this._isResponding = false;
   }
 
   resetResponseState(): void {
     this.stopResponseAnimation();
+    this._streamOpen = false;
     this._fullResponse = "";
     this._currentIndex = 0;
     this._thinkingMessageId = null;
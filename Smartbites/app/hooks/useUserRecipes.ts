@@ -11,6 +11,25 @@ export interface Recipe {
   cost?: number;
 }
 
+// Recipe lists are requested in the server's compact form: field names once,
+// then one array of values per recipe.
+const COMPACT_JSON = "application/vnd.smartbites.compact+json";
+
+interface CompactList {
+  fields: string[];
+  rows: unknown[][];
+}
+
+function expandRows<T>({ fields, rows }: CompactList): T[] {
+  return rows.map((row) => {
+    const item: Record<string, unknown> = {};
+    fields.forEach((field, i) => {
+      item[field] = row[i];
+    });
+    return item as T;
+  });
+}
+
 export default function useUserRecipes() {
   const [localRecipes, setLocalRecipes] = useState<Recipe[]>([]);
   const [loading, setLoading] = useState(true);
@@ -24,11 +43,12 @@ export default function useUserRecipes() {
       
       const res = await fetch(
         "http://192.168.100.10:8000/api/get-user-recipes/",
-        { headers: { Authorization: `Token ${token}` } }
+        { headers: { Authorization: `Token ${token}`, Accept: COMPACT_JSON } }
       );
       
       if (!res.ok) throw new Error(`Status ${res.status}`);
-      const data: Recipe[] = await res.json();
+      const body = await res.json();
+      const data: Recipe[] = Array.isArray(body) ? body : expandRows<Recipe>(body);
       setLocalRecipes(data);
     } catch (err) {
       setError(err instanceof Error ? err.message : String(err));
@@ -10,11 +10,18 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
+from datetime import timedelta
 from pathlib import Path
 
+from dotenv import load_dotenv
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# look for a .env file in the same directory as settings.py
+load_dotenv(BASE_DIR / 'smartbites' / '.env')
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -51,11 +58,18 @@ DJOSER = {
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.ExpiringTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'api.renderers.CompactJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
 }
 
 MIDDLEWARE = [
+    'api.instrumentation.PerformanceMiddleware',
+    'api.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,6 +78,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'api.routers.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'smartbites.urls'
@@ -90,16 +105,88 @@ WSGI_APPLICATION = 'smartbites.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'smartbites',
-        'USER': 'root',
-        'PASSWORD': 'hyeju1113',
-        'HOST': 'localhost',
-        'PORT': '3306',
+# Persistent connections: each worker keeps its connection for DB_CONN_MAX_AGE
+# seconds (0 closes it after every request) and pings it before reuse.
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+DB_CONN_HEALTH_CHECKS = os.environ.get('DB_CONN_HEALTH_CHECKS', 'true').lower() == 'true'
+
+if os.environ.get('DB_ENGINE') == 'sqlite':
+    # Local stand-in: one SQLite file for the primary plus DB_SQLITE_REPLICAS replica files
+    # (seed them by copying db.sqlite3 to db_replica1.sqlite3, db_replica2.sqlite3, ...)
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+    for index in range(1, int(os.environ.get('DB_SQLITE_REPLICAS', 0)) + 1):
+        DATABASES[f'replica{index}'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / f'db_replica{index}.sqlite3',
+            'TEST': {'MIRROR': 'default'},
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.mysql',
+            'NAME': 'smartbites',
+            'USER': 'root',
+            'PASSWORD': 'hyeju1113',
+            'HOST': 'localhost',
+            'PORT': '3306',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+        }
+    }
+    # Comma-separated replica hosts, e.g. DB_REPLICA_HOSTS=10.0.0.5,10.0.0.6
+    for index, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+        DATABASES[f'replica{index}'] = {
+            **DATABASES['default'],
+            'HOST': host.strip(),
+            'TEST': {'MIRROR': 'default'},
+        }
+
+# Read replicas and routing (see api/routers.py)
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['api.routers.PrimaryReplicaRouter']
+
+# URL names of views whose reads can be served by a replica
+REPLICA_READ_VIEWS = ['get_user_recipes', 'get_user_profile', 'current-user']
+
+# After a client writes, its reads stay on the primary for this many seconds
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/ref/settings/#caches
+
+# 'default' holds per-worker state that is fine to lose; 'shared' holds state
+# that every worker and management command must agree on (replica stickiness,
+# purge stats, failed-login counters when it is Redis). With REDIS_URL both
+# live in Redis; without it 'default' is per process and 'shared' is a
+# database table, created by migration api.0011 (run
+# `python manage.py createcachetable` if you rename it).
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        },
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'smartbites_shared_cache',
+        },
     }
-}
 
 
 # Password validation
@@ -121,6 +208,36 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashers
+# https://docs.djangoproject.com/en/5.1/topics/auth/passwords/
+
+# PBKDF2 cost; existing hashes are upgraded (or downgraded) on the next login
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 0)) or None
+
+PASSWORD_HASHERS = [
+    'api.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# Login, register and change-password hash on a bounded pool (see api/passwords.py):
+# at most WORKERS hashes run at once and QUEUE more may wait; the rest get a 503.
+# The pool is per process and the request thread waits for its hash, so it only
+# keeps hashing from starving other endpoints when each process serves requests
+# on several threads (e.g. gunicorn --worker-class gthread --threads 8). With
+# one-request-per-process sync workers, limit hashing by worker count instead.
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', 2))
+PASSWORD_HASHING_QUEUE = int(os.environ.get('PASSWORD_HASHING_QUEUE', 8))
+PASSWORD_HASHING_TIMEOUT = 10
+
+# Failed attempts allowed per email and per IP within the window (seconds) before a 429
+AUTH_FAILURES_PER_EMAIL = 5
+AUTH_FAILURES_PER_IP = 50
+AUTH_FAILURE_WINDOW = 15 * 60
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -145,12 +262,33 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'api.CustomUser' 
 
-import os
-from dotenv import load_dotenv
-
-# look for a .env file in the same directory as settings.py
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-load_dotenv(os.path.join(BASE_DIR, '.env'))
+# Auth tokens expire TOKEN_TTL after their last refresh; use refreshes them at most
+# once per TOKEN_REFRESH_INTERVAL. Run `manage.py purge_expired_auth` periodically.
+TOKEN_TTL = timedelta(days=int(os.environ.get('TOKEN_TTL_DAYS', 30)))
+TOKEN_REFRESH_INTERVAL = timedelta(hours=1)
+
+# Instrumentation (see api/instrumentation.py)
+SERVER_TIMING_HEADER = os.environ.get('SERVER_TIMING_HEADER', 'true').lower() == 'true'
+# Addresses allowed to scrape /api/metrics/
+METRICS_ALLOWED_IPS = os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1').split(',')
+
+# Response compression (see api/compression.py); brotli is used when the
+# optional brotli package is installed, gzip otherwise
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
+# BiteAI (Ollama)
+OLLAMA_URL = os.environ.get('OLLAMA_URL', 'http://127.0.0.1:11434/api/generate')
+OLLAMA_MODEL = os.environ.get('OLLAMA_MODEL', 'biteai')
+# Seconds to wait for the connection and between streamed chunks
+OLLAMA_TIMEOUT = int(os.environ.get('OLLAMA_TIMEOUT', 300))
+
+# Meal plans: how many recipes one plan generates at once, and the longest plan allowed
+MEAL_PLAN_PARALLELISM = int(os.environ.get('MEAL_PLAN_PARALLELISM', 7))
+# Generation threads shared by all meal plans of a process (caps concurrent Ollama calls)
+MEAL_PLAN_WORKERS = int(os.environ.get('MEAL_PLAN_WORKERS', 14))
+MEAL_PLAN_MAX_DAYS = 14
 
 EMAIL_BACKEND        = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST           = 'smtp.gmail.com'